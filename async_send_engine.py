@@ -0,0 +1,98 @@
+import asyncio
+from itertools import islice
+
+from send_engine import SendSummary, recipient_domain
+
+# Recipients taken from the (blocking) recipient iterator at a time
+PRODUCER_BATCH_SIZE = 100
+
+
+async def run_sends_async(recipients, process_recipient, concurrency=100, per_domain_limit=None,
+                          summary=None, scheduler=None):
+    """
+    asyncio counterpart of run_sends(): await process_recipient(recipient) for every recipient
+    with at most `concurrency` recipients in flight overall and at most `per_domain_limit` per domain.
+    recipients is a normal iterable - it is read in a worker thread, so reading a CSV file
+    or waiting for the render farm never blocks the event loop.
+    process_recipient must return (success, error_msg), with success None when the recipient
+    was queued for a retry on the scheduler.
+    """
+    summary = summary if summary is not None else SendSummary()
+    concurrency = max(1, concurrency)
+    # Bounded, so the producer only reads ahead a little of what the senders can take
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    domain_slots = {}
+    state = {'producing': True, 'active': 0}
+    changed = asyncio.Event()
+
+    def domain_slot(email):
+        domain = recipient_domain(email)
+        semaphore = domain_slots.get(domain)
+        if semaphore is None:
+            semaphore = domain_slots[domain] = asyncio.Semaphore(per_domain_limit)
+        return semaphore
+
+    async def produce():
+        iterator = iter(recipients)
+        try:
+            while True:
+                batch = await asyncio.to_thread(lambda: list(islice(iterator, PRODUCER_BATCH_SIZE)))
+                if not batch:
+                    return
+                for recipient in batch:
+                    await queue.put(recipient)
+        finally:
+            state['producing'] = False
+            changed.set()
+
+    async def handle(recipient):
+        name = recipient['Name']
+        try:
+            if per_domain_limit:
+                async with domain_slot(recipient['Mail']):
+                    success, error_msg = await process_recipient(recipient)
+            else:
+                success, error_msg = await process_recipient(recipient)
+        except Exception as e:
+            success, error_msg = False, f"Failed to process email for {name}: {e}"
+        if success is not None:
+            summary.record(name, success, error_msg)
+
+    async def sender():
+        while True:
+            recipient = await queue.get()
+            state['active'] += 1
+            try:
+                await handle(recipient)
+            finally:
+                state['active'] -= 1
+                queue.task_done()
+                changed.set()
+
+    async def pump_retries():
+        # Feed due retries back into the queue until the list is done and nothing is left to retry
+        while True:
+            if scheduler is not None:
+                for recipient in scheduler.due_retries():
+                    await queue.put(recipient)
+            idle = not state['producing'] and state['active'] == 0 and queue.empty()
+            if idle and (scheduler is None or not scheduler.pending):
+                return
+            delay = scheduler.next_retry_delay() if scheduler is not None else None
+            changed.clear()
+            try:
+                await asyncio.wait_for(changed.wait(), delay if delay is not None else None)
+            except asyncio.TimeoutError:
+                pass
+
+    senders = [asyncio.create_task(sender()) for _ in range(concurrency)]
+    producer = asyncio.create_task(produce())
+    try:
+        await pump_retries()
+        await producer
+    finally:
+        producer.cancel()
+        for task in senders:
+            task.cancel()
+        await asyncio.gather(producer, *senders, return_exceptions=True)
+    return summary
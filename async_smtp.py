@@ -0,0 +1,312 @@
+import ssl
+import time
+import base64
+import socket
+import asyncio
+from functools import lru_cache
+from smtplib import (
+    quoteaddr,
+    SMTPServerDisconnected,
+    SMTPConnectError,
+    SMTPHeloError,
+    SMTPAuthenticationError,
+    SMTPNotSupportedError,
+    SMTPSenderRefused,
+    SMTPRecipientsRefused,
+    SMTPDataError,
+    SMTPResponseException
+)
+
+from instrumentation import METRICS
+from smtp_pipelining import wire_data, data_block
+
+# Seconds a relay is skipped after a connection to it failed
+RELAY_RETRY_AFTER = 30
+
+
+@lru_cache(maxsize=None)
+def local_hostname():
+    # Resolving our own name can block on DNS, so it is done once and not for every new session
+    return socket.getfqdn()
+
+
+# Class for one SMTP session on asyncio streams - the non-blocking counterpart of smtplib.SMTP.
+# Only what sending needs is implemented: EHLO/HELO, AUTH PLAIN/LOGIN, sendmail (pipelined when
+# the server supports it), RSET and QUIT. Failures raise the same exceptions as smtplib.
+class AsyncSMTPConnection:
+    def __init__(self, host, port, use_ssl=True, context=None, timeout=60, pipelining=True):
+        self.host = host
+        self.port = int(port)
+        self.use_ssl = use_ssl
+        self.context = context
+        self.timeout = timeout
+        self.pipelining = pipelining
+        self.extensions = {}
+        self.does_esmtp = False
+        self.messages_sent = 0
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self.context if self.use_ssl else None),
+                self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise SMTPConnectError(-1, f"Timed out connecting to {self.host}:{self.port}")
+        code, reply = await self.getreply()
+        if code != 220:
+            await self.close()
+            raise SMTPConnectError(code, reply)
+        await self.ehlo_or_helo()
+
+    async def send(self, data):
+        if self.writer is None:
+            raise SMTPServerDisconnected("please run connect() first")
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        try:
+            self.writer.write(data)
+            await asyncio.wait_for(self.writer.drain(), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            await self.close()
+            raise SMTPServerDisconnected(f"Server not connected: {e}")
+
+    async def getreply(self):
+        """Read one (possibly multi-line) reply and return (code, text) like smtplib"""
+        lines = []
+        while True:
+            try:
+                line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                await self.close()
+                raise SMTPServerDisconnected(f"Connection unexpectedly closed: {e}")
+            if not line:
+                await self.close()
+                raise SMTPServerDisconnected("Connection unexpectedly closed")
+            lines.append(line[4:].strip(b' \t\r\n'))
+            if line[3:4] != b'-':
+                break
+        try:
+            code = int(line[:3])
+        except ValueError:
+            code = -1
+        return code, b'\n'.join(lines)
+
+    async def command(self, text):
+        await self.send(text + "\r\n")
+        return await self.getreply()
+
+    async def ehlo_or_helo(self):
+        code, reply = await self.command(f"ehlo {local_hostname()}")
+        if code == 250:
+            self.does_esmtp = True
+            self.extensions = {}
+            for line in reply.decode('latin-1').split('\n')[1:]:
+                keyword, _, parameters = line.partition(' ')
+                self.extensions[keyword.lower()] = parameters.strip()
+            return
+        code, reply = await self.command(f"helo {local_hostname()}")
+        if code != 250:
+            raise SMTPHeloError(code, reply)
+
+    def has_extn(self, name):
+        return name.lower() in self.extensions
+
+    async def login(self, user, password):
+        if not self.has_extn('auth'):
+            raise SMTPNotSupportedError("SMTP AUTH extension not supported by server.")
+        mechanisms = self.extensions['auth'].upper().split()
+        if 'PLAIN' in mechanisms:
+            token = base64.b64encode(f"\0{user}\0{password}".encode('utf-8')).decode('ascii')
+            code, reply = await self.command(f"AUTH PLAIN {token}")
+        elif 'LOGIN' in mechanisms:
+            code, reply = await self.command("AUTH LOGIN " + base64.b64encode(user.encode('utf-8')).decode('ascii'))
+            if code == 334:
+                code, reply = await self.command(base64.b64encode(password.encode('utf-8')).decode('ascii'))
+        else:
+            raise SMTPNotSupportedError("No suitable authentication method found.")
+        if code not in (235, 503):
+            raise SMTPAuthenticationError(code, reply)
+
+    async def _reset(self, code):
+        # Like smtplib: a 421 reply means the server is closing the session, otherwise clear the transaction
+        if code == 421:
+            await self.close()
+            return
+        try:
+            await self.command("rset")
+        except SMTPServerDisconnected:
+            pass
+
+    async def sendmail(self, from_addr, to_addrs, msg):
+        """Send one message - returns the refused recipients like smtplib.SMTP.sendmail()"""
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        msg = wire_data(msg)
+        options = " size=%d" % len(msg) if self.has_extn('size') else ""
+        mail_command = "mail FROM:%s%s" % (quoteaddr(from_addr), options)
+        rcpt_commands = ["rcpt TO:%s" % quoteaddr(address) for address in to_addrs]
+
+        if self.pipelining and self.has_extn('pipelining'):
+            # Whole envelope plus DATA in one write, then all replies in order
+            await self.send("".join(command + "\r\n" for command in [mail_command] + rcpt_commands + ["data"]))
+            mail_code, mail_reply = await self.getreply()
+            rcpt_replies = [await self.getreply() for _ in to_addrs]
+            data_code, data_reply = await self.getreply()
+        else:
+            mail_code, mail_reply = await self.command(mail_command)
+            if mail_code != 250:
+                await self._reset(mail_code)
+                raise SMTPSenderRefused(mail_code, mail_reply, from_addr)
+            rcpt_replies = []
+            for command in rcpt_commands:
+                rcpt_replies.append(await self.command(command))
+                if rcpt_replies[-1][0] == 421:
+                    break
+            data_code = data_reply = None
+
+        refused = {address: reply for address, reply in zip(to_addrs, rcpt_replies) if reply[0] not in (250, 251)}
+        all_refused = len(refused) == len(to_addrs)
+        if data_code == 354 and (mail_code != 250 or all_refused):
+            # A server accepting DATA without a valid envelope gets an empty message, which it has to reject
+            await self.send(b'.\r\n')
+            data_code, data_reply = await self.getreply()
+        if mail_code != 250:
+            await self._reset(mail_code)
+            raise SMTPSenderRefused(mail_code, mail_reply, from_addr)
+        if all_refused or any(code == 421 for code, _ in refused.values()):
+            await self._reset(421 if any(code == 421 for code, _ in refused.values()) else 0)
+            raise SMTPRecipientsRefused(refused)
+        if data_code is None:
+            data_code, data_reply = await self.command("data")
+        if data_code != 354:
+            await self._reset(data_code)
+            raise SMTPDataError(data_code, data_reply)
+
+        await self.send(data_block(msg))
+        code, reply = await self.getreply()
+        if code != 250:
+            await self._reset(code)
+            raise SMTPDataError(code, reply)
+        self.messages_sent += 1
+        return refused
+
+    async def quit(self):
+        try:
+            await self.command("quit")
+        except SMTPServerDisconnected:
+            pass
+        await self.close()
+
+    async def close(self):
+        writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+class _Relay:
+    """Idle sessions and free connection slots of one relay server"""
+
+    def __init__(self, host, port, size):
+        self.host = host
+        self.port = port
+        self.slots = asyncio.Semaphore(size)
+        self.idle = []
+        self.waiting = 0
+        self.down_until = 0.0
+
+
+# Class spreading the sends of a run over one or more relay servers, with at most
+# `connections_per_relay` sessions per relay. Like SMTPConnectionPool, sessions are kept
+# logged in between messages and replaced after max_messages_per_connection messages.
+class AsyncSMTPPool:
+    def __init__(self, relays, sender_email, password=None, connections_per_relay=10,
+                 max_messages_per_connection=100, use_ssl=True, timeout=60, pipelining=True):
+        self.relays = [_Relay(host, int(port), max(1, int(connections_per_relay))) for host, port in relays]
+        if not self.relays:
+            raise ValueError("At least one relay server is needed")
+        self.sender_email = sender_email
+        self.password = password
+        self.max_messages_per_connection = max(1, int(max_messages_per_connection))
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.pipelining = pipelining
+        self.context = ssl.create_default_context() if use_ssl else None
+        self.connections_opened = 0
+        self.reconnects = 0
+
+    def _pick_relay(self):
+        # The relay with the fewest queued and running sends, skipping relays that recently refused connections
+        now = time.monotonic()
+        available = [relay for relay in self.relays if relay.down_until <= now] or self.relays
+        return min(available, key=lambda relay: relay.waiting)
+
+    async def _connect(self, relay):
+        connection = AsyncSMTPConnection(relay.host, relay.port, self.use_ssl, self.context,
+                                         self.timeout, self.pipelining)
+        start = time.perf_counter()
+        try:
+            await connection.connect()
+            # Local test servers usually run without AUTH, so only log in when a password is given
+            if self.password:
+                await connection.login(self.sender_email, self.password)
+        except (OSError, SMTPConnectError, SMTPServerDisconnected):
+            relay.down_until = time.monotonic() + RELAY_RETRY_AFTER
+            await connection.close()
+            raise
+        except Exception:
+            await connection.close()
+            raise
+        METRICS.add_time("smtp_connect", time.perf_counter() - start)
+        self.connections_opened += 1
+        return connection
+
+    async def sendmail(self, from_addr, to_addrs, msg):
+        """
+        Send one message on a pooled session of the least busy relay.
+        If the server dropped the session while it was idle, reconnect once and retry.
+        """
+        relay = self._pick_relay()
+        relay.waiting += 1
+        try:
+            async with relay.slots:
+                connection = relay.idle.pop() if relay.idle else await self._connect(relay)
+                healthy = True
+                start = time.perf_counter()
+                try:
+                    try:
+                        return await connection.sendmail(from_addr, to_addrs, msg)
+                    except SMTPServerDisconnected:
+                        await connection.close()
+                        self.reconnects += 1
+                        connection = await self._connect(relay)
+                        return await connection.sendmail(from_addr, to_addrs, msg)
+                except (SMTPResponseException, SMTPRecipientsRefused):
+                    # The server rejected this message but the session itself is still usable
+                    raise
+                except BaseException:
+                    healthy = False
+                    raise
+                finally:
+                    METRICS.add_time("smtp_send", time.perf_counter() - start)
+                    if healthy and connection.writer is not None \
+                            and connection.messages_sent < self.max_messages_per_connection:
+                        relay.idle.append(connection)
+                    elif healthy and connection.writer is not None:
+                        await connection.quit()
+                    else:
+                        await connection.close()
+        finally:
+            relay.waiting -= 1
+
+    async def close(self):
+        """Log out of all idle sessions"""
+        for relay in self.relays:
+            while relay.idle:
+                await relay.idle.pop().quit()
@@ -0,0 +1,159 @@
+import os
+import json
+import importlib.util
+from collections.abc import Mapping
+
+from newPage import TemplateSet
+from condition_matcher import ConditionMatcher
+from send_engine import SendSummary
+
+
+class ManifestError(Exception):
+    """The campaign manifest is missing, malformed or refers to files that cannot be loaded"""
+
+
+def load_config_module(path, module_name):
+    """Import a campaign configuration file (a copy of email_config.py with other templates/conditions)"""
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    if spec is None:
+        raise ManifestError(f"{path} is not a Python file")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Class for one campaign of a batch run: its templates, the recipients it is sent to
+# and its own results, while the recipient list and the SMTP sessions are shared
+class Campaign:
+    def __init__(self, name, templates, config_file, recipient_filter=None):
+        self.name = name
+        self.templates = templates
+        self.config_file = config_file
+        # Same format as a CONDITIONAL_CONTENT entry: {'column': ..., 'trigger_values': [...]}
+        self.recipient_filter = recipient_filter
+        self._filter = ConditionMatcher([recipient_filter]) if recipient_filter else None
+        self.summary = SendSummary()
+        # DeliveryJournal of the campaign in send mode
+        self.journal = None
+
+    def includes(self, recipient):
+        """Whether the campaign is sent to a recipient"""
+        return self._filter is None or bool(self._filter.match(recipient))
+
+    def columns(self):
+        """Columns this campaign reads from the recipient list (None = all)"""
+        columns = self.templates.referenced_columns()
+        if columns is None:
+            return None
+        if self.recipient_filter:
+            columns.add(self.recipient_filter['column'])
+        return columns
+
+
+def load_manifest(path):
+    """
+    Read a campaign manifest, a JSON file like
+        {
+          "recipients": "exampleRecipient.csv",
+          "campaigns": [
+            {"name": "everyone", "config": "email_config.py"},
+            {"name": "vip", "config": "campaigns/vip.py",
+             "filter": {"column": "VIP", "trigger_values": ["TRUE", "Yes"]}}
+          ]
+        }
+    "recipients" is optional (--recipients is used otherwise); paths are relative to the manifest.
+    Returns (recipients file or None, list of Campaign).
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            manifest = json.load(file)
+    except OSError as e:
+        raise ManifestError(f"Could not read {path}: {e}")
+    except ValueError as e:
+        raise ManifestError(f"{path} is not valid JSON: {e}")
+
+    base = os.path.dirname(os.path.abspath(path))
+    entries = manifest.get('campaigns') if isinstance(manifest, dict) else None
+    if not entries:
+        raise ManifestError(f"{path} lists no campaigns")
+    if not isinstance(entries, list):
+        raise ManifestError(f"'campaigns' in {path} has to be a list of campaigns")
+
+    campaigns = []
+    for number, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ManifestError(f"Campaign {number} in {path} has to be an object with 'name' and 'config'")
+        name = entry.get('name') or f"campaign{number}"
+        if any(campaign.name == name for campaign in campaigns):
+            raise ManifestError(f"Campaign name '{name}' is used twice in {path}")
+        if 'config' not in entry:
+            raise ManifestError(f"Campaign '{name}' has no config file")
+        config_file = os.path.join(base, entry['config'])
+        recipient_filter = entry.get('filter')
+        if recipient_filter is not None:
+            if not isinstance(recipient_filter, dict) or not {'column', 'trigger_values'} <= set(recipient_filter):
+                raise ManifestError(f"The filter of campaign '{name}' needs a 'column' and 'trigger_values'")
+            # A single string would be matched character by character
+            if not isinstance(recipient_filter['trigger_values'], list):
+                raise ManifestError(f"The trigger_values of campaign '{name}' have to be a list, like [\"TRUE\"]")
+        try:
+            module = load_config_module(config_file, f"campaign_{number}_config")
+        except Exception as e:
+            raise ManifestError(f"Could not load {config_file} of campaign '{name}': {e}")
+        templates = TemplateSet.from_module(module, name=name)
+        campaigns.append(Campaign(name, templates, config_file, recipient_filter))
+
+    recipients = manifest.get('recipients')
+    return (os.path.join(base, recipients) if recipients else None), campaigns
+
+
+def batch_columns(campaigns):
+    """Columns the recipient list has to provide for all campaigns together (None = all)"""
+    columns = {'Name', 'Mail'}
+    for campaign in campaigns:
+        campaign_columns = campaign.columns()
+        if campaign_columns is None:
+            return None
+        columns |= campaign_columns
+    return columns
+
+
+class CampaignRecipient(Mapping):
+    """A recipient of one campaign: reads like the recipient's record and knows its campaign"""
+    __slots__ = ('campaign', 'record')
+
+    def __init__(self, campaign, record):
+        self.campaign = campaign
+        self.record = record
+
+    @property
+    def retry_key(self):
+        # Retries are counted per campaign, so another campaign's sends do not use up or reset them
+        return (self.campaign.name, self.record['Mail'])
+
+    def __getitem__(self, column):
+        return self.record[column]
+
+    def __contains__(self, column):
+        return column in self.record
+
+    def __iter__(self):
+        return iter(self.record)
+
+    def __len__(self):
+        return len(self.record)
+
+    def get(self, column, default=None):
+        return self.record.get(column, default)
+
+
+def campaign_recipients(recipients, campaigns, skip=None):
+    """
+    Yield a CampaignRecipient for every campaign each recipient belongs to, going through the
+    recipient list only once - so it works for streamed lists as well.
+    skip(campaign, recipient) can exclude recipients, e.g. those already delivered.
+    """
+    for recipient in recipients:
+        for campaign in campaigns:
+            if campaign.includes(recipient) and not (skip is not None and skip(campaign, recipient)):
+                yield CampaignRecipient(campaign, recipient)
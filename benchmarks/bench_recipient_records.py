@@ -0,0 +1,54 @@
+"""
+Per-recipient overhead of walking a recipient DataFrame:
+DataFrame.iterrows() + dict(row) (the old hot loop) versus iter_records().
+
+    python benchmarks/bench_recipient_records.py --rows 1000000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.synthetic import write_synthetic_csv
+from main import load_recipients
+from recipient_record import iter_records
+
+
+def touch(recipient_data):
+    # Access the fields a typical render reads
+    return (recipient_data['Name'], recipient_data['Mail'],
+            'Nickname' in recipient_data and recipient_data['Nickname'])
+
+
+def bench_iterrows(df):
+    for _, row in df.iterrows():
+        touch(dict(row))
+
+
+def bench_records(df):
+    for record in iter_records(df):
+        touch(record)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--extra-columns", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_file = write_synthetic_csv(os.path.join(directory, "recipients.csv"), args.rows, args.extra_columns)
+        df = load_recipients(csv_file, use_cache=False)
+
+    for label, bench in [("iterrows + dict", bench_iterrows), ("iter_records", bench_records)]:
+        start = time.perf_counter()
+        bench(df)
+        elapsed = time.perf_counter() - start
+        print(f"{label:16s} {elapsed:8.2f} s total  {elapsed / args.rows * 1e6:8.2f} us/recipient")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Render-only throughput benchmark for the newPage pipeline.
+
+Generates a synthetic recipient CSV and times every stage separately:
+CSV loading, template formatting (newPage construction), condition evaluation,
+returnPage (HTML + plain text) and MIME assembly. Nothing is sent.
+
+    python benchmarks/bench_render.py --rows 20000
+    python benchmarks/bench_render.py --rows 20000 --save-baseline
+    python benchmarks/bench_render.py --rows 20000 --compare
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.synthetic import write_synthetic_csv
+from main import load_recipients
+from mime_fastpath import MessageSkeleton
+from newPage import newPage
+from recipient_record import iter_records
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+STAGES = ["format_template", "processConditionalContent", "returnPage", "mime"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def render_all(df):
+    """Render every recipient and return the per-stage and per-message timings in seconds"""
+    stage_totals = dict.fromkeys(STAGES, 0.0)
+    latencies = []
+    skeleton = MessageSkeleton("sender@example.com")
+    clock = time.perf_counter
+    for record in iter_records(df):
+        start = clock()
+        page = newPage(recipient_name=record['Name'], recipient_data=record)
+        formatted = clock()
+        page.processConditionalContent()
+        conditions = clock()
+        plain_text, html_text = page.returnPage()
+        rendered = clock()
+        skeleton.render(record['Mail'], record['Name'], plain_text, html_text)
+        done = clock()
+
+        stage_totals["format_template"] += formatted - start
+        stage_totals["processConditionalContent"] += conditions - formatted
+        stage_totals["returnPage"] += rendered - conditions
+        stage_totals["mime"] += done - rendered
+        latencies.append(done - start)
+    return stage_totals, latencies
+
+
+def run(rows, extra_columns):
+    # main imports pandas on first use - load it here so the timed load measures parsing, not the import
+    import pandas  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_file = write_synthetic_csv(os.path.join(directory, "recipients.csv"), rows, extra_columns)
+        # Status output of the pipeline is not what we want to measure
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            start = time.perf_counter()
+            # Measure parsing the CSV file, not reading its columnar sidecar cache
+            df = load_recipients(csv_file, use_cache=False)
+            load_seconds = time.perf_counter() - start
+            stage_totals, latencies = render_all(df)
+
+    latencies.sort()
+    render_seconds = sum(latencies)
+    return {
+        "rows": rows,
+        "extra_columns": extra_columns,
+        "load_recipients_us_per_row": load_seconds / rows * 1e6,
+        "stages_us_per_message": {stage: total / rows * 1e6 for stage, total in stage_totals.items()},
+        "messages_per_second": rows / render_seconds if render_seconds else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def report(result, baseline=None, threshold=0.2):
+    """Print the results; with a baseline, flag every time that got slower by more than threshold"""
+    regressions = []
+
+    def line(label, value, unit, baseline_value=None, higher_is_better=False):
+        text = f"{label:32s} {value:12.2f} {unit}"
+        if baseline_value:
+            change = (value - baseline_value) / baseline_value
+            text += f"   (baseline {baseline_value:.2f}, {change:+.0%})"
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                text += "  REGRESSION"
+                regressions.append(label)
+        print(text)
+
+    base = baseline or {}
+    print(f"Rendered {result['rows']} recipients ({result['extra_columns']} extra columns)")
+    line("load_recipients", result["load_recipients_us_per_row"], "us/row", base.get("load_recipients_us_per_row"))
+    for stage in STAGES:
+        line(stage, result["stages_us_per_message"][stage], "us/msg",
+             base.get("stages_us_per_message", {}).get(stage))
+    line("throughput", result["messages_per_second"], "msg/s", base.get("messages_per_second"), higher_is_better=True)
+    line("p50 latency", result["p50_ms"], "ms", base.get("p50_ms"))
+    line("p99 latency", result["p99_ms"], "ms", base.get("p99_ms"))
+    line("peak RSS", result["peak_rss_mb"], "MB", base.get("peak_rss_mb"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--extra-columns", type=int, default=0)
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the results in {BASELINE_FILE}")
+    parser.add_argument("--compare", action="store_true", help="compare against the stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown reported as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    result = run(args.rows, args.extra_columns)
+
+    baseline = None
+    if args.compare:
+        with open(BASELINE_FILE, encoding="utf-8") as file:
+            baseline = json.load(file)
+    regressions = report(result, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+        print(f"Baseline saved to {BASELINE_FILE}")
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Round trips and send time per message with and without ESMTP PIPELINING,
+measured against a local SMTP stand-in that delays every reply to emulate
+a high-latency relay link.
+
+    python benchmarks/bench_smtp_roundtrips.py --messages 200 --latency-ms 20
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.smtp_standin import SMTPStandIn
+from mime_fastpath import MessageSkeleton
+from smtp_pool import SMTPConnectionPool
+
+SENDER = "sender@example.com"
+
+
+def run(messages, latency, server_pipelining, client_pipelining):
+    skeleton = MessageSkeleton(SENDER)
+    with SMTPStandIn(pipelining=server_pipelining, latency=latency) as standin:
+        pool = SMTPConnectionPool(standin.host, standin.port, SENDER, use_ssl=False,
+                                  max_messages_per_connection=messages, pipelining=client_pipelining)
+        start = time.perf_counter()
+        for number in range(messages):
+            email = f"recipient{number}@example.com"
+            message = skeleton.render(email, f"Recipient {number}", "Hello", "<p>Hello</p>")
+            pool.sendmail(SENDER, email, message)
+        seconds = time.perf_counter() - start
+        pool.close()
+        return standin.messages, standin.round_trips_per_message, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="delay of every server reply")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    print(f"{args.messages} messages, {args.latency_ms:.0f} ms per server reply")
+    for label, server_pipelining, client_pipelining in [
+        ("lock-step (pipelining off)", True, False),
+        ("server without PIPELINING", False, True),
+        ("pipelined", True, True),
+    ]:
+        delivered, round_trips, seconds = run(args.messages, latency, server_pipelining, client_pipelining)
+        print(f"{label:28s} {delivered:6d} delivered  {round_trips:5.2f} round trips/msg"
+              f"  {seconds / args.messages * 1e3:8.2f} ms/msg")
+
+
+if __name__ == "__main__":
+    main()
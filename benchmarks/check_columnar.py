@@ -0,0 +1,135 @@
+"""
+Equivalence check of Parquet/Feather recipient lists and the CSV sidecar cache against CSV files.
+
+Generates random recipient tables with typed columns - integers, decimals, booleans,
+text with quotes and padding, dates, timestamps and columns that are entirely empty,
+each with random missing values - and writes every table as CSV, Parquet and Feather.
+All three are read with main.read_recipients, the CSV file a second time from its
+columnar sidecar, and every file whose column names, values or value types differ
+from the CSV result is reported. Needs pyarrow (pip install pyarrow).
+
+    python benchmarks/check_columnar.py
+    python benchmarks/check_columnar.py --tables 2000 --seed 4
+"""
+import os
+import sys
+import csv
+import math
+import random
+import datetime
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from columnar_input import pyarrow_available, sidecar_path
+
+WORDS = ['alpha', 'Beta', ' gamma ', '"quoted"', 'two words', 'é', 'x,y']
+
+
+def random_column(rng, kind, rows):
+    """Values of one column, None for a missing value"""
+    def value():
+        if kind == 'int':
+            return rng.randint(-1000, 1000)
+        if kind == 'float':
+            # Quarters are exact in binary, so CSV text and stored floats agree
+            return rng.randint(-400, 400) / 4
+        if kind == 'bool':
+            return rng.random() < 0.5
+        if kind == 'text':
+            return rng.choice(WORDS)
+        if kind == 'date':
+            return datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randint(0, 900))
+        if kind == 'timestamp':
+            return datetime.datetime(2020, 1, 1) + datetime.timedelta(seconds=rng.randint(0, 10 ** 8))
+        return None
+    missing = rng.choice([0.0, 0.0, 0.3])
+    return [None if kind == 'empty' or rng.random() < missing else value() for _ in range(rows)]
+
+
+def csv_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+def write_files(rng, directory):
+    """Write one random table as CSV, Parquet and Feather and return the three paths"""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    rows = rng.randint(1, 8)
+    columns = {'Name': random_column(rng, 'text', rows), 'Mail': [f"r{row}@example.com" for row in range(rows)]}
+    for position in range(rng.randint(1, 5)):
+        kind = rng.choice(['int', 'float', 'bool', 'text', 'date', 'timestamp', 'empty'])
+        columns[f"{kind}_{position}"] = random_column(rng, kind, rows)
+
+    csv_file = os.path.join(directory, "recipients.csv")
+    with open(csv_file, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        writer.writerows([csv_text(value) for value in row] for row in zip(*columns.values()))
+    table = pa.table({name: pa.array(values) for name, values in columns.items()})
+    parquet_file = os.path.join(directory, "recipients.parquet")
+    feather_file = os.path.join(directory, "recipients.feather")
+    pq.write_table(table, parquet_file)
+    feather.write_feather(table, feather_file)
+    return csv_file, parquet_file, feather_file
+
+
+def comparable(value):
+    """Value with its type, so 1, 1.0 and True do not compare equal"""
+    if isinstance(value, float) and math.isnan(value):
+        return ('nan',)
+    if hasattr(value, 'item'):
+        value = value.item()
+    return (type(value).__name__, value)
+
+
+def rows_of(df):
+    return list(df.columns), [[comparable(value) for value in row] for row in df.itertuples(index=False, name=None)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=500, help="number of random tables")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if not pyarrow_available():
+        sys.exit("pyarrow is needed for Parquet and Feather files (pip install pyarrow)")
+    from main import read_recipients
+
+    rng = random.Random(args.seed)
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(args.tables):
+            csv_file, parquet_file, feather_file = write_files(rng, directory)
+            if os.path.exists(sidecar_path(csv_file)):
+                os.remove(sidecar_path(csv_file))
+            expected = rows_of(read_recipients(csv_file, use_cache=True)[0])
+            results = {
+                "sidecar": read_recipients(csv_file, use_cache=True),
+                "parquet": read_recipients(parquet_file),
+                "feather": read_recipients(feather_file),
+            }
+            for source, (df, path) in results.items():
+                if source == "sidecar" and path == csv_file:
+                    print("The sidecar was not used - is the cache switched off?")
+                if rows_of(df) != expected:
+                    mismatches += 1
+                    if mismatches <= 10:
+                        with open(csv_file, encoding='utf-8') as file:
+                            print(f"{source} differs for\n{file.read()}  csv   {expected}\n  {source} {rows_of(df)}")
+
+    print(f"Checked {args.tables} tables, {mismatches} columnar reads differ from the CSV file")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Equivalence check of the DataFrame condition mask against the per-recipient condition matcher.
+
+Generates random condition lists - repeated names, '*' wildcards, trigger values of every
+type, conditions on columns the recipient list lacks - and random recipient DataFrames with
+text, numbers, booleans and missing values, cleaned like a loaded CSV file. For each it compares
+
+  - ConditionMatcher.condition_mask() row by row with ConditionMatcher.match(),
+  - preview.condition_summary() on the DataFrame with the same on its records,
+  - preview.sample_recipients(..., 'combinations') on the DataFrame with the same on its records,
+
+and reports every case that differs.
+
+    python benchmarks/check_conditions.py
+    python benchmarks/check_conditions.py --cases 5000 --seed 3
+"""
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pandas as pd
+
+from main import clean_recipients
+from newPage import TemplateSet
+from preview import condition_summary, sample_recipients
+from recipient_record import iter_records
+
+COLUMNS = ['A', 'B', 'C']
+NAMES = ['first', 'second', 'third', 'first']
+TRIGGERS = ['*', 'TRUE', 'yes', 'x', '1', '1.0', 'nan', '', True, 1, 2.5]
+VALUES = ['yes', ' Yes ', 'x', 'X', '"x"', '', '1', 'true', True, False, 1, 2.5, None]
+
+
+def random_templates(rng):
+    conditions = [
+        {
+            'name': rng.choice(NAMES),
+            'column': rng.choice(COLUMNS + ['Missing']),
+            'trigger_values': rng.sample(TRIGGERS, rng.randint(1, 3)),
+            'content': '',
+        }
+        for _ in range(rng.randint(0, 6))
+    ]
+    return TemplateSet(conditions, '', '', '', render_cache_size=0)
+
+
+def random_frame(rng):
+    rows = rng.randint(1, 12)
+    data = {'Name': [f"Name {row}" for row in range(rows)], 'Mail': [f"r{row}@example.com" for row in range(rows)]}
+    for column in rng.sample(COLUMNS, rng.randint(1, len(COLUMNS))):
+        pool = rng.sample(VALUES, rng.randint(1, 4))
+        data[column] = [rng.choice(pool) for _ in range(rows)]
+    return clean_recipients(pd.DataFrame(data))
+
+
+def compare(templates, df):
+    """Return None if both ways agree, otherwise a description of the difference"""
+    matcher = templates.matcher
+    mask = matcher.condition_mask(df)
+    masked = [[index for index, applies in enumerate(row) if applies] for row in mask.to_numpy()]
+    matched = [matcher.match(record) for record in iter_records(df)]
+    if masked != matched:
+        return f"condition_mask {masked}\n  match          {matched}"
+    frame_summary = condition_summary(df, templates)
+    record_summary = condition_summary(iter_records(df), templates)
+    if frame_summary != record_summary:
+        return f"summary of the DataFrame {frame_summary}\n  summary of the records   {record_summary}"
+    frame_sample = [record['Mail'] for record in sample_recipients(df, 'combinations', templates=templates)]
+    record_sample = [record['Mail'] for record in sample_recipients(iter_records(df), 'combinations', templates=templates)]
+    if frame_sample != record_sample:
+        return f"combinations of the DataFrame {frame_sample}\n  combinations of the records   {record_sample}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=2000, help="number of random condition lists and DataFrames")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mismatches = 0
+    for _ in range(args.cases):
+        templates = random_templates(rng)
+        df = random_frame(rng)
+        result = compare(templates, df)
+        if result is not None:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"{templates.conditional_content}\n{df}\n  {result}")
+
+    print(f"Checked {args.cases} condition lists, {mismatches} differ between the DataFrame and the records")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Equivalence check of csv_records against pandas.
+
+Writes small random CSV files - integers, booleans, decimals, missing-value
+markers, quoted and padded cells, unicode - and reads each with
+csv_records.read_csv_records and with pandas.read_csv followed by
+clean_recipients(), the way main.load_recipients reads CSV files. Every file
+whose column names, values or value types differ is reported; files the stdlib
+reader hands over to pandas (NeedsPandas) are counted but not compared.
+
+    python benchmarks/check_csv_records.py
+    python benchmarks/check_csv_records.py --files 10000 --seed 5
+"""
+import os
+import sys
+import math
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pandas as pd
+
+from csv_records import read_csv_records, NeedsPandas
+from main import clean_recipients, csv_usecols
+
+CELLS = [
+    '1', '2', ' 3 ', '-4', '+7', '00', ' 5', '6 ', '1_000', '0x1', '１', '9007199254740993',
+    'True', 'false', 'TRUE', 'TRUE ', 'yes',
+    '1.5', '1e3', 'inf', '-',
+    '', '  ', 'nan', 'NA', 'None', 'null', '#N/A',
+    'abc', 'x y', ' "q" ', '"a,b"', 'é',
+]
+
+
+def comparable(value):
+    """Value with its type, so 1, 1.0 and True do not compare equal"""
+    if isinstance(value, float) and math.isnan(value):
+        return ('nan',)
+    if hasattr(value, 'item'):
+        value = value.item()
+    return (type(value).__name__, value)
+
+
+def random_file(rng, path):
+    """Write a random CSV file and return the columns to read from it (None = all)"""
+    column_count = rng.randint(2, 4)
+    header = [f"C{position}" for position in range(column_count)]
+    lines = [','.join(header)]
+    lines += [','.join(rng.choice(CELLS) for _ in header) for _ in range(rng.randint(1, 6))]
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    if rng.random() < 0.3:
+        return set(rng.sample(header, rng.randint(1, column_count)))
+    return None
+
+
+def compare(path, columns):
+    """Return None if both readers agree, 'pandas' if the stdlib reader defers to pandas, else a description"""
+    try:
+        names, records = read_csv_records(path, columns)
+    except NeedsPandas:
+        return 'pandas'
+    df = clean_recipients(pd.read_csv(path, usecols=csv_usecols(columns)))
+    expected = [[comparable(value) for value in row] for row in df.itertuples(index=False, name=None)]
+    got = [[comparable(value) for value in record.as_tuple()] for record in records]
+    if names != list(df.columns) or got != expected:
+        return f"columns {names} vs {list(df.columns)}\n  csv_records {got}\n  pandas      {expected}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=3000, help="number of random CSV files")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mismatches = 0
+    deferred = 0
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "recipients.csv")
+        for _ in range(args.files):
+            columns = random_file(rng, path)
+            result = compare(path, columns)
+            if result == 'pandas':
+                deferred += 1
+            elif result is not None:
+                mismatches += 1
+                if mismatches <= 10:
+                    with open(path, encoding='utf-8') as file:
+                        print(f"{file.read()!r} (columns {columns}):\n  {result}")
+
+    print(f"Checked {args.files} CSV files ({deferred} left to pandas), {mismatches} differ from pandas")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
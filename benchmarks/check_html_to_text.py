@@ -0,0 +1,110 @@
+"""
+Equivalence check of html_to_text against BeautifulSoup.
+
+Builds random HTML snippets from tags, entities, comments, script/style/template
+elements, CDATA and stray markup characters, converts each with html_to_text and
+with BeautifulSoup(html, 'html.parser').get_text(separator='\\n', strip=True) -
+what newPage used before - and reports every snippet whose text differs.
+The rendered emails of exampleRecipient.csv are checked as well.
+Needs beautifulsoup4 (pip install beautifulsoup4).
+
+    python benchmarks/check_html_to_text.py
+    python benchmarks/check_html_to_text.py --cases 50000 --seed 3
+"""
+import os
+import sys
+import random
+import argparse
+import warnings
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from html_to_text import html_to_text
+
+# beautifulsoup4 produces the reference output - main() reports it if it is missing
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+PIECES = [
+    '<p>', '</p>', '<br>', '<br/>', '<b>', '</b>', '<strong>', '</strong>', '<em>', '</em>',
+    '<div class="a">', '</div>', '<a href="x">', '</a>', '<img src="x"/>',
+    ' text ', 'Hi', 'Hello, World', '\n  ', '  ', 'é', 'ü€',
+    '&amp;', '&lt;', '&nbsp;', '&eacute;', '&copy', '&bogus;', '&#65;', '&#x41;', '&#65x', '&#233;', '&#150;',
+    '&#0;', '&#xD800;', '&#12a;', '&', '<', '>', '"', "'",
+    '<!-- c -->', '<!DOCTYPE html>', '<![CDATA[zz]]>', '<?pi?>',
+    '<script>x<y</script>', '<style>p{}</style>', '<template>t<b>u</b></template>',
+    '<textarea>q</textarea>', '<title>T</title>',
+]
+
+
+def reference_text(html):
+    """Plain text part as newPage produced it with BeautifulSoup"""
+    return BeautifulSoup(html, 'html.parser').get_text(separator='\n', strip=True)
+
+
+def random_cases(count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 15)))
+
+
+def example_cases():
+    """The HTML of every email rendered for the example CSV file"""
+    from main import load_recipients
+    from newPage import newPage
+    from recipient_record import iter_records
+
+    pages = []
+    # Status output of the pipeline is not what we want to see
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for record in iter_records(load_recipients(use_cache=False)):
+            page = newPage(recipient_name=record['Name'], recipient_data=record)
+            page.processConditionalContent()
+            pages.append(page.returnPage()[1])
+    return pages
+
+
+def check(cases):
+    """Return (number of snippets, list of (html, expected, converted) mismatches)"""
+    count = 0
+    mismatches = []
+    for html in cases:
+        count += 1
+        expected = reference_text(html)
+        try:
+            converted = html_to_text(html)
+        except Exception as e:
+            converted = f"raised {e!r}"
+        if converted != expected:
+            mismatches.append((html, expected, converted))
+    return count, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=20000, help="number of random HTML snippets")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    if BeautifulSoup is None:
+        sys.exit("beautifulsoup4 is needed for the reference output (pip install beautifulsoup4)")
+    # Random markup makes BeautifulSoup warn about things like "looks like a URL"
+    warnings.filterwarnings("ignore", module="bs4")
+
+    count, mismatches = check(example_cases())
+    random_count, random_mismatches = check(random_cases(args.cases, args.seed))
+    count += random_count
+    mismatches += random_mismatches
+
+    for html, expected, converted in mismatches[:10]:
+        print(f"{html!r}:\n  BeautifulSoup {expected!r}\n  html_to_text  {converted!r}")
+    print(f"Checked {count} HTML snippets, {len(mismatches)} differ from BeautifulSoup")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
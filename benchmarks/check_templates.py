@@ -0,0 +1,131 @@
+"""
+Equivalence check of the compiled templates against the original format_template loop.
+
+Renders randomly generated templates - nested fallbacks, stray braces and pipes,
+values that contain placeholders themselves - with template_compiler (both the
+compiled render plan and format_template_iterative) and with the regex loop
+newPage.format_template used before templates were compiled, and reports every
+template whose output differs. The configured templates of email_config.py are
+checked against every recipient of exampleRecipient.csv as well.
+
+    python benchmarks/check_templates.py
+    python benchmarks/check_templates.py --cases 300000 --seed 7
+"""
+import os
+import re
+import sys
+import random
+import argparse
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from template_compiler import CompiledTemplate, format_template_iterative
+
+PIECES = ['{', '}', '|', 'A', 'B', 'C', ' ', 'x', '\n', '{A}', '{B|', '{C|{A}}', '|}', '{|']
+VALUES = ['', 'nan', 'None', 'FALSE', 'v', '  w ', '{A}', 'a|b', '{', '}', '{B|z}', None, 3, 0.0]
+
+
+def reference_format_template(template, recipient_data):
+    """newPage.format_template as it was before template_compiler, kept verbatim as the reference"""
+    result = template
+    max_iterations = 5  # Prevent infinite loops
+
+    for iteration in range(max_iterations):
+        def replace_simple_placeholder(match):
+            column_name = match.group(1).strip()
+            if column_name in recipient_data:
+                value = str(recipient_data[column_name]).strip()
+                if value and value.lower() not in ['nan', 'none', 'false', '']:
+                    return value
+            return ""
+
+        # First pass: replace all simple placeholders
+        prev_result = result
+        result = re.sub(r'\{([^|{}]+)\}', replace_simple_placeholder, result)
+
+        # Second pass: handle fallback placeholders
+        def replace_fallback_placeholder(match):
+            content = match.group(1)
+            if '|' in content:
+                parts = content.split('|', 1)
+                column_name = parts[0].strip()
+                fallback = parts[1].strip()
+
+                # Check if the column exists and has a non-empty value
+                if column_name in recipient_data:
+                    value = str(recipient_data[column_name]).strip()
+                    if value and value.lower() not in ['nan', 'none', 'false', '']:
+                        return value
+
+                # Use fallback
+                return fallback
+
+            return match.group(0)  # Return unchanged if no fallback
+
+        result = re.sub(r'\{([^{}]+\|[^{}]+)\}', replace_fallback_placeholder, result)
+
+        # If no changes were made, we're done
+        if result == prev_result:
+            break
+
+    return result
+
+
+def random_cases(count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        template = ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 14)))
+        data = {column: rng.choice(VALUES) for column in 'ABC' if rng.random() < 0.8}
+        yield template, data
+
+
+def configured_cases():
+    """The templates of email_config.py with every recipient of the example CSV file"""
+    from main import load_recipients
+    from newPage import DEFAULT_TEMPLATES
+    from recipient_record import iter_records
+
+    # Status output of the loader is not what we want to see
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        recipients = list(iter_records(load_recipients(use_cache=False)))
+    for _, template in DEFAULT_TEMPLATES.templates():
+        for record in recipients:
+            yield template, record
+            yield template, {column: record[column] for column in record if column != 'Nickname'}
+
+
+def check(cases):
+    """Return (number of cases, list of (template, data, expected, compiled, iterative) mismatches)"""
+    count = 0
+    mismatches = []
+    for template, data in cases:
+        count += 1
+        expected = reference_format_template(template, data)
+        compiled = CompiledTemplate(template).render(data)
+        iterative = format_template_iterative(template, data)
+        if compiled != expected or iterative != expected:
+            mismatches.append((template, data, expected, compiled, iterative))
+    return count, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=100000, help="number of random templates")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    count, mismatches = check(configured_cases())
+    random_count, random_mismatches = check(random_cases(args.cases, args.seed))
+    count += random_count
+    mismatches += random_mismatches
+
+    for template, data, expected, compiled, iterative in mismatches[:10]:
+        print(f"{template!r} with {data!r}:\n  reference {expected!r}\n  compiled  {compiled!r}\n  iterative {iterative!r}")
+    print(f"Checked {count} templates, {len(mismatches)} differ from the original format_template")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Minimal local SMTP server standing in for a real relay in benchmarks.
+
+It accepts everything except recipients whose address starts with "reject",
+can advertise PIPELINING or not, delays every reply by a fixed latency to
+emulate a slow link, and counts the round trips (batches of replies the
+client had to wait for) spent on each message.
+"""
+import time
+import threading
+import socketserver
+
+CRLF = b'\r\n'
+
+
+class _Session(socketserver.BaseRequestHandler):
+    def handle(self):
+        standin = self.server.standin
+        self.sock = self.request
+        self.send_replies(["220 stand-in ESMTP"], counted=False)
+        buffer = b''
+        in_data = False
+        data = b''
+        valid_recipients = 0
+        while True:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                return
+            buffer += chunk
+            replies = []
+            transaction = False
+            closing = False
+            while True:
+                if in_data:
+                    data += buffer
+                    buffer = b''
+                    end = (CRLF + data).find(CRLF + b'.' + CRLF)
+                    if end < 0:
+                        break
+                    # Everything after the terminating line is already the next command group
+                    buffer = data[end + 3:]
+                    in_data = False
+                    transaction = True
+                    if valid_recipients:
+                        standin.record_message()
+                        replies.append("250 OK queued")
+                    else:
+                        replies.append("554 no valid recipients")
+                    data = b''
+                    valid_recipients = 0
+                    continue
+                line_end = buffer.find(CRLF)
+                if line_end < 0:
+                    break
+                line = buffer[:line_end].decode('ascii', 'replace')
+                buffer = buffer[line_end + 2:]
+                verb = line[:4].upper()
+                if verb == 'EHLO':
+                    extensions = ["PIPELINING"] if standin.pipelining else []
+                    extensions.append("SIZE 52428800")
+                    replies.append("250-stand-in")
+                    replies += [f"250-{extension}" for extension in extensions[:-1]]
+                    replies.append(f"250 {extensions[-1]}")
+                elif verb == 'HELO':
+                    replies.append("250 stand-in")
+                elif verb == 'MAIL':
+                    transaction = True
+                    valid_recipients = 0
+                    replies.append("250 OK")
+                elif verb == 'RCPT':
+                    transaction = True
+                    address = line.split(':', 1)[1].strip().lstrip('<')
+                    if address.startswith('reject'):
+                        replies.append("550 no such user")
+                    else:
+                        valid_recipients += 1
+                        replies.append("250 OK")
+                elif verb == 'DATA':
+                    transaction = True
+                    if valid_recipients:
+                        in_data = True
+                        replies.append("354 go ahead")
+                    else:
+                        replies.append("554 no valid recipients")
+                elif verb in ('RSET', 'NOOP'):
+                    valid_recipients = 0
+                    replies.append("250 OK")
+                elif verb == 'QUIT':
+                    replies.append("221 bye")
+                    closing = True
+                    break
+                else:
+                    replies.append("500 unknown command")
+            if replies:
+                self.send_replies(replies, counted=transaction)
+            if closing:
+                return
+
+    def send_replies(self, replies, counted):
+        standin = self.server.standin
+        if standin.latency:
+            time.sleep(standin.latency)
+        if counted:
+            standin.record_round_trip()
+        self.sock.sendall(''.join(reply + '\r\n' for reply in replies).encode('ascii'))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # Many clients connect at the same time - with the default backlog of 5 some would hang
+    request_queue_size = 256
+
+
+# Class running the stand-in server in a background thread on a free local port
+class SMTPStandIn:
+    def __init__(self, pipelining=True, latency=0.0, host="127.0.0.1", port=0):
+        self.pipelining = pipelining
+        self.latency = latency
+        self.messages = 0
+        self.round_trips = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Session)
+        self._server.standin = self
+        self.host, self.port = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def record_message(self):
+        with self._lock:
+            self.messages += 1
+
+    def record_round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+
+    @property
+    def round_trips_per_message(self):
+        return self.round_trips / self.messages if self.messages else 0.0
@@ -0,0 +1,45 @@
+import csv
+import random
+
+# Header and value pools modeled on exampleRecipient.csv
+BASE_COLUMNS = ["Name", "Mail", "Nickname", "Department", "Birthday", "Age",
+                "Technic", "Workshop", "VIP", "NewMember", "PersonalNote"]
+NAMES = ["Saruman", "Gandalf", "Frodo", "Aragorn", "Legolas", "Gimli", "Samwise", "Boromir"]
+NICKNAMES = ["The White Wizard", "Mithrandir", "Mr. Underhill", "Strider", "", ""]
+DEPARTMENTS = ["Engineering", "Management", "Marketing", "IT", "Development", "Sales"]
+DOMAINS = ["mordor.me", "eagle.air", "shire.hobbit", "gondor.realm", "woodland.realm"]
+FLAGS = ["TRUE", "FALSE", "FALSE", "Yes", "1", ""]
+BIRTHDAYS = ["TRUE", "FALSE", "FALSE", "Today", "This Month"]
+NOTES = ["Remember to bring the ring!", "Don't forget to bring fireworks!", "", ""]
+
+
+def synthetic_row(index, rng, extra_columns=0):
+    """Return one recipient row as a list of strings"""
+    name = rng.choice(NAMES)
+    row = [
+        f"{name} {index}",
+        f"{name.lower()}{index}@{rng.choice(DOMAINS)}",
+        rng.choice(NICKNAMES),
+        rng.choice(DEPARTMENTS),
+        rng.choice(BIRTHDAYS),
+        str(rng.randint(18, 3000)),
+        rng.choice(FLAGS),
+        rng.choice(FLAGS),
+        rng.choice(FLAGS),
+        rng.choice(FLAGS),
+        rng.choice(NOTES),
+    ]
+    row.extend(f"attr{column}_{rng.randint(0, 99)}" for column in range(extra_columns))
+    return row
+
+
+def write_synthetic_csv(path, rows, extra_columns=0, seed=42):
+    """Write a recipient CSV with the example header plus extra_columns unused attribute columns"""
+    rng = random.Random(seed)
+    header = BASE_COLUMNS + [f"Attribute{column}" for column in range(extra_columns)]
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(header)
+        for index in range(rows):
+            writer.writerow(synthetic_row(index, rng, extra_columns))
+    return path
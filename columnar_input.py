@@ -0,0 +1,216 @@
+import os
+import json
+
+# pyarrow is optional - it is only needed for Parquet/Feather/Arrow recipient lists and the CSV sidecar cache.
+# It is imported on first use by require_pyarrow(), so runs that never touch a columnar file do not load it.
+pa = pc = feather = pq = None
+
+PARQUET = 'parquet'
+FEATHER = 'feather'
+
+# File extensions of the columnar formats; Feather (version 2) is the Arrow IPC file format
+COLUMNAR_EXTENSIONS = {
+    '.parquet': PARQUET,
+    '.pq': PARQUET,
+    '.feather': FEATHER,
+    '.arrow': FEATHER,
+    '.ipc': FEATHER,
+}
+
+# Bumped whenever clean_recipients() or the sidecar layout changes, so sidecars written by older versions are rebuilt
+SIDECAR_VERSION = b'2'
+
+
+def columnar_format(path):
+    """Return PARQUET or FEATHER for a columnar recipient file, None for anything else (CSV)"""
+    return COLUMNAR_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def pyarrow_available():
+    try:
+        require_pyarrow()
+    except ImportError:
+        return False
+    return True
+
+
+def require_pyarrow():
+    global pa, pc, feather, pq
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("pyarrow is needed for Parquet, Feather and Arrow files (pip install pyarrow)")
+    pa, pc, feather, pq = pyarrow, pyarrow.compute, pyarrow.feather, pyarrow.parquet
+
+
+def clean_name(name):
+    return name.strip().replace('"', '')
+
+
+def _project(schema_names, columns):
+    # Keep the file's column order; referenced columns the file lacks are reported later by the templates
+    if columns is None:
+        return None
+    return [name for name in schema_names if clean_name(name) in columns]
+
+
+def _csv_like(array):
+    """
+    Convert a column to the type pandas.read_csv would give the same data in a CSV file:
+    numbers and booleans stay, everything else (dates, times, categories) is text.
+    """
+    array_type = array.type
+    if pa.types.is_dictionary(array_type):
+        return _csv_like(array.cast(array_type.value_type))
+    if pa.types.is_null(array_type) or pa.types.is_decimal(array_type):
+        # An empty column and decimal numbers are floats in a CSV file
+        return array.cast(pa.float64())
+    if pa.types.is_boolean(array_type):
+        if not array.null_count:
+            return array
+        # A CSV column of booleans with gaps is text: 'True', 'False' and 'nan' after cleaning
+        return pc.if_else(array, 'True', 'False').fill_null('nan')
+    if pa.types.is_integer(array_type) or pa.types.is_floating(array_type):
+        # Missing numbers become NaN in pandas, as in a CSV file
+        return array
+    if pa.types.is_timestamp(array_type):
+        # Same text as str() of a pandas Timestamp (Arrow writes fractions of a second for %S)
+        seconds = pc.cast(array, pa.timestamp('s', array_type.tz), safe=False)
+        array = pc.strftime(seconds, format='%Y-%m-%d %H:%M:%S')
+    elif not (pa.types.is_string(array_type) or pa.types.is_large_string(array_type)):
+        array = array.cast(pa.string())
+    return pc.replace_substring(pc.utf8_trim_whitespace(array.fill_null('nan')), '"', '')
+
+
+def clean_table(table):
+    """
+    Arrow counterpart of clean_recipients(): remove quotes and extra spaces from the column names
+    and string values. Missing values become 'nan' (text) or NaN (numbers), as they do when a CSV
+    column is cleaned, so columns of other types are converted to what a CSV file would give.
+    """
+    arrays = [_csv_like(array) for array in table.columns]
+    return pa.table(arrays, names=[clean_name(name) for name in table.column_names])
+
+
+def read_table(path, columns=None):
+    """
+    Read a Parquet or Feather/Arrow IPC file as an Arrow table, memory-mapped and limited to `columns`
+    (None = all). Columns that are not requested are never read from disk; uncompressed Feather
+    columns are used in place without being copied.
+    """
+    require_pyarrow()
+    if columnar_format(path) == PARQUET:
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        return parquet_file.read(columns=_project(parquet_file.schema_arrow.names, columns))
+    with pa.memory_map(path) as source:
+        names = pa.ipc.open_file(source).schema.names
+    return feather.read_table(path, columns=_project(names, columns), memory_map=True)
+
+
+def iter_batches(path, batch_size, columns=None):
+    """
+    Return an iterator over the rows of a Parquet or Feather/Arrow IPC file as Arrow record batches
+    of at most batch_size rows. The file is opened right away, so a missing file is reported here.
+    """
+    require_pyarrow()
+    if columnar_format(path) == PARQUET:
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        return parquet_file.iter_batches(batch_size=batch_size,
+                                         columns=_project(parquet_file.schema_arrow.names, columns))
+    # Slicing a memory-mapped table does not copy anything, so only the rows in use are paged in
+    return iter(read_table(path, columns).to_batches(max_chunksize=batch_size))
+
+
+def batch_frames(batches, clean=True):
+    """
+    Turn record batches into pandas DataFrames whose index counts the rows across all batches,
+    like the chunks of pandas.read_csv(chunksize=...). With clean, values are cleaned like a CSV file.
+    """
+    import pandas as pd
+
+    start = 0
+    for batch in batches:
+        table = pa.Table.from_batches([batch])
+        if clean:
+            table = clean_table(table)
+        df = table.to_pandas()
+        df.index = pd.RangeIndex(start, start + len(df))
+        start += len(df)
+        yield df
+
+
+def sidecar_path(csv_file):
+    """Path of the columnar cache of a CSV file: a hidden .feather file next to it"""
+    directory, name = os.path.split(csv_file)
+    return os.path.join(directory, f".{name}.feather")
+
+
+def _source_stamp(csv_file):
+    stat = os.stat(csv_file)
+    return {b'source_size': str(stat.st_size).encode(), b'source_mtime_ns': str(stat.st_mtime_ns).encode(),
+            b'sidecar_version': SIDECAR_VERSION}
+
+
+def fresh_sidecar(csv_file, columns=None):
+    """
+    Return the sidecar path of a CSV file if a sidecar exists, matches the file's current size and mtime
+    and holds all of `columns` the CSV file has (columns None = every column of the CSV file).
+    """
+    if not pyarrow_available():
+        return None
+    path = sidecar_path(csv_file)
+    try:
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+        stamp = _source_stamp(csv_file)
+    except (OSError, pa.ArrowInvalid):
+        return None
+    metadata = schema.metadata or {}
+    if any(metadata.get(key) != value for key, value in stamp.items()):
+        return None
+    # A sidecar written for fewer columns than needed now is as good as stale
+    source_columns = set(json.loads(metadata.get(b'source_columns', b'[]')))
+    needed = source_columns if columns is None else source_columns & set(columns)
+    if not needed <= set(schema.names):
+        return None
+    return path
+
+
+def write_sidecar(csv_file, df, source_columns):
+    """
+    Store the cleaned DataFrame of a CSV file as an uncompressed Feather file next to it,
+    so the next run can memory-map it instead of parsing and cleaning the CSV again.
+    source_columns is the full (cleaned) header of the CSV file, df may hold only some of them.
+    Returns the sidecar path.
+    """
+    require_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), **_source_stamp(csv_file),
+                b'source_columns': json.dumps(list(source_columns)).encode('utf-8')}
+    table = table.replace_schema_metadata(metadata)
+    path = sidecar_path(csv_file)
+    # Written under a temporary name, so an interrupted run never leaves a half-written sidecar behind
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(table, temporary, compression='uncompressed')
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return path
+
+
+def file_columns(path):
+    """Cleaned column names of a Parquet or Feather/Arrow IPC file, read from its schema only"""
+    require_pyarrow()
+    if columnar_format(path) == PARQUET:
+        names = pq.read_schema(path, memory_map=True).names
+    else:
+        with pa.memory_map(path) as source:
+            names = pa.ipc.open_file(source).schema.names
+    return [clean_name(name) for name in names]
@@ -0,0 +1,77 @@
+# Special trigger value that matches any non-empty value
+WILDCARD = '*'
+
+
+class ConditionMatcher:
+    """
+    CONDITIONAL_CONTENT compiled into lookup tables grouped by column.
+    Each recipient costs one dictionary lookup per referenced column instead of
+    a scan over every condition and its trigger values.
+    """
+
+    def __init__(self, conditions):
+        self.conditions = list(conditions)
+        # Upper-cased trigger values of every condition, in configuration order
+        self.trigger_sets = [frozenset(str(v).upper() for v in condition['trigger_values'])
+                             for condition in self.conditions]
+        # column -> (trigger value -> indices of the conditions it activates, indices of '*' conditions)
+        self.columns = {}
+        for index, condition in enumerate(self.conditions):
+            value_index, wildcard = self.columns.setdefault(condition['column'], ({}, []))
+            triggers = self.trigger_sets[index]
+            if WILDCARD in triggers:
+                wildcard.append(index)
+            else:
+                for value in triggers:
+                    value_index.setdefault(value, []).append(index)
+        self.columns = {
+            column: ({value: tuple(indices) for value, indices in value_index.items()}, tuple(wildcard))
+            for column, (value_index, wildcard) in self.columns.items()
+        }
+
+    def match(self, recipient_data):
+        """Return the indices of all conditions that apply to a recipient, in configuration order"""
+        matched = []
+        for column, (value_index, wildcard) in self.columns.items():
+            if column not in recipient_data:
+                continue
+            value = str(recipient_data[column]).strip()
+            indices = value_index.get(value.upper())
+            if indices:
+                matched.extend(indices)
+            if wildcard and value and value != 'nan':
+                matched.extend(wildcard)
+        matched.sort()
+        return matched
+
+    def missing_conditions(self, recipient_data):
+        """Return the indices of all conditions whose column is missing from the recipient data"""
+        return [index for index, condition in enumerate(self.conditions)
+                if condition['column'] not in recipient_data]
+
+    def condition_mask(self, recipients_df):
+        """
+        Evaluate all conditions for a whole DataFrame at once.
+        Returns a boolean DataFrame with one row per recipient and one column per condition,
+        labelled with the condition's index (names need not be unique).
+        """
+        import pandas as pd
+
+        # Clean every referenced column only once, however many conditions use it
+        cleaned = {}
+        for column in self.columns:
+            if column in recipients_df.columns:
+                values = recipients_df[column].astype(str).str.strip()
+                cleaned[column] = (values, values.str.upper())
+
+        mask = {}
+        for index, condition in enumerate(self.conditions):
+            if condition['column'] not in cleaned:
+                mask[index] = pd.Series(False, index=recipients_df.index)
+                continue
+            values, upper_values = cleaned[condition['column']]
+            if WILDCARD in self.trigger_sets[index]:
+                mask[index] = (values != '') & (values != 'nan')
+            else:
+                mask[index] = upper_values.isin(self.trigger_sets[index])
+        return pd.DataFrame(mask, index=recipients_df.index, columns=range(len(self.conditions)))
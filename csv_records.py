@@ -0,0 +1,90 @@
+import os
+import re
+import csv
+
+from recipient_record import RecipientRecord
+
+# Strings pandas.read_csv reads as missing values by default
+NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+])
+BOOL_VALUES = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False}
+_INTEGER = re.compile(r'[ \t]*[+-]?[0-9]+[ \t]*')
+# Larger integers are not turned into floats exactly the same way by pandas
+MAX_EXACT_INTEGER = 2 ** 53
+NAN = float('nan')
+
+
+class NeedsPandas(Exception):
+    """The file uses something the stdlib reader does not reproduce exactly - read it with pandas instead"""
+
+
+def _is_float(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _clean_value(value):
+    # Same as clean_recipients() on a string column
+    return value.strip().replace('"', '')
+
+
+def convert_column(values):
+    """
+    Convert the raw strings of one CSV column to the values pandas.read_csv followed by
+    clean_recipients() would produce: ints, bools, floats (ints with missing values) or cleaned strings.
+    """
+    present = [value for value in values if value not in NA_VALUES]
+    if not present:
+        return [NAN] * len(values)
+    if all(_INTEGER.fullmatch(value) for value in present):
+        if any(abs(int(value)) >= MAX_EXACT_INTEGER for value in present):
+            raise NeedsPandas("integers too large")
+        if len(present) == len(values):
+            return [int(value) for value in values]
+        return [NAN if value in NA_VALUES else float(int(value)) for value in values]
+    if all(value in BOOL_VALUES for value in present):
+        if len(present) == len(values):
+            return [BOOL_VALUES[value] for value in values]
+        return ['nan' if value in NA_VALUES else str(BOOL_VALUES[value]) for value in values]
+    if all(_is_float(value) for value in present):
+        # Decimal numbers are parsed by pandas' own float parser, which may round differently
+        raise NeedsPandas("decimal numbers")
+    return ['nan' if value in NA_VALUES else _clean_value(value) for value in values]
+
+
+def read_csv_records(csv_file, columns=None):
+    """
+    Read a small recipient CSV file with the stdlib csv module instead of pandas and return
+    (column names, list of RecipientRecord), with the same values load_recipients() would produce.
+    Only the given columns are kept (None = all). Raises NeedsPandas if the file uses something
+    only pandas reads exactly, like duplicate header names, ragged rows or decimal numbers.
+    """
+    with open(csv_file, newline='', encoding='utf-8-sig') as file:
+        rows = [row for row in csv.reader(file) if row]
+    if not rows:
+        raise NeedsPandas("empty file")
+    header = [name.strip().replace('"', '') for name in rows[0]]
+    if '' in header or len(set(header)) != len(header):
+        raise NeedsPandas("unnamed or duplicate columns")
+    body = rows[1:]
+    if any(len(row) != len(header) for row in body):
+        raise NeedsPandas("rows with a different number of fields than the header")
+
+    positions = [position for position, name in enumerate(header) if columns is None or name in columns]
+    names = [header[position] for position in positions]
+    converted = [convert_column([row[position] for row in body]) for position in positions]
+    column_index = {name: position for position, name in enumerate(names)}
+    return names, [RecipientRecord(column_index, values) for values in zip(*converted)] if names else []
+
+
+def is_small_csv(csv_file, max_bytes):
+    """Whether a CSV file is small enough for read_csv_records()"""
+    try:
+        return max_bytes > 0 and os.path.getsize(csv_file) <= max_bytes
+    except OSError:
+        return False
@@ -0,0 +1,93 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+SENT = 'sent'
+FAILED = 'failed'
+
+
+def campaign_hash(config_file, csv_file):
+    """Identify a campaign by the content of its configuration file and the name of its recipient list"""
+    digest = hashlib.sha256()
+    with open(config_file, 'rb') as file:
+        digest.update(file.read())
+    digest.update(os.path.basename(csv_file).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def mail_key(email):
+    """Normalized form of an address used to look recipients up in the journal"""
+    return str(email).strip().lower()
+
+
+# Class for an append-only record of every delivery attempt, stored in an SQLite file.
+# Each attempt is committed with a full fsync as soon as it happened, so an interrupted
+# run can be resumed without sending anybody the same email twice.
+class DeliveryJournal:
+    def __init__(self, path, campaign):
+        self.path = path
+        self.campaign = campaign
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            " campaign TEXT NOT NULL, mail TEXT NOT NULL, name TEXT,"
+            " status TEXT NOT NULL, error TEXT, recorded_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS deliveries_campaign_mail ON deliveries (campaign, mail)"
+        )
+        # Everybody who already got this campaign, kept in memory for constant time lookups
+        self.delivered = {
+            row[0] for row in self.connection.execute(
+                "SELECT mail FROM deliveries WHERE campaign = ? AND status = ?", (campaign, SENT)
+            )
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_delivered(self, email):
+        return mail_key(email) in self.delivered
+
+    def _append(self, email, name, status, error=None):
+        with self._lock:
+            self.connection.execute(
+                "INSERT INTO deliveries (campaign, mail, name, status, error, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.campaign, mail_key(email), name, status, error, time.time())
+            )
+            if status == SENT:
+                self.delivered.add(mail_key(email))
+
+    def record_sent(self, email, name):
+        self._append(email, name, SENT)
+
+    def record_failed(self, email, name, error):
+        self._append(email, name, FAILED, error)
+
+    def summary(self):
+        """
+        Rebuild the result of the campaign from the journal, across all runs.
+        Returns (successful_sends, failed_sends, failed_recipients) - a recipient only counts
+        as failed if no later attempt delivered the email.
+        """
+        with self._lock:
+            failed_recipients = self.connection.execute(
+                "SELECT name, error FROM deliveries WHERE rowid IN ("
+                " SELECT MAX(rowid) FROM deliveries WHERE campaign = ? AND status = ? GROUP BY mail)"
+                " AND mail NOT IN (SELECT mail FROM deliveries WHERE campaign = ? AND status = ?)"
+                " ORDER BY rowid",
+                (self.campaign, FAILED, self.campaign, SENT)
+            ).fetchall()
+            return len(self.delivered), len(failed_recipients), failed_recipients
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
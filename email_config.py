@@ -204,4 +204,89 @@ DEFAULT_CLOSING = '''
 SHOW_MISSING_COLUMN_WARNINGS = False
 
 # Whether to continue processing if a conditional column is missing
-CONTINUE_ON_MISSING_COLUMNS = True
\ No newline at end of file
+CONTINUE_ON_MISSING_COLUMNS = True
+
+# Reject recipients whose email domain has no mail server before sending (python main.py --check-mx).
+# Needs one DNS lookup per domain; dnspython is used for real MX lookups if installed.
+CHECK_MX_RECORDS = False
+
+# Create the plain text version of each email with BeautifulSoup (needs beautifulsoup4 installed)
+# instead of the faster built-in conversion - both produce the same text
+USE_BEAUTIFULSOUP_FOR_PLAIN_TEXT = False
+
+# =============================================================================
+# SENDING SETTINGS
+# =============================================================================
+
+# Number of SMTP sessions kept open at the same time while sending
+SMTP_POOL_SIZE = 1
+
+# Messages sent on one session before it is closed and a fresh one is opened
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+
+# Send MAIL FROM, RCPT TO and DATA in one go on servers that support ESMTP PIPELINING,
+# which saves round trips on slow links (servers without it are used the normal way)
+SMTP_PIPELINING = True
+
+# Number of emails rendered and sent in parallel (can be overridden with --workers)
+SEND_WORKERS = 1
+
+# Maximum number of parallel sends to the same recipient domain, e.g. gmail.com (0 = no limit)
+MAX_CONCURRENT_SENDS_PER_DOMAIN = 4
+
+# Number of CSV rows read at a time when streaming the recipient list (python main.py --stream)
+CSV_CHUNK_SIZE = 10000
+
+# Keep a cleaned copy of the CSV file as a hidden columnar file next to it (.NAME.csv.feather),
+# which later runs memory-map instead of parsing the CSV again while it is unchanged (needs pyarrow)
+CSV_SIDECAR_CACHE = True
+
+# CSV files up to this size (in bytes) are read with Python's csv module instead of pandas,
+# which starts much faster for small lists (0 = always use pandas)
+SMALL_CSV_MAX_BYTES = 1000000
+
+# SQLite file recording every delivery, used to resume interrupted runs (python main.py --send --resume)
+DELIVERY_JOURNAL_FILE = "delivery_journal.sqlite"
+
+# Maximum number of emails sent per second (0 = no limit) and how many may go out at once after a pause.
+# The rate is lowered automatically when the server answers 421/451 ("slow down"), down to SEND_MIN_RATE,
+# and slowly raised again while sends succeed. Without a limit this starts at the speed sent so far.
+SEND_RATE_LIMIT = 0
+SEND_RATE_BURST = 10
+SEND_MIN_RATE = 0.5
+
+# Temporary failures (4xx replies, dropped connections) are retried this many times,
+# waiting SEND_RETRY_BASE_DELAY seconds before the first retry and doubling the wait each time
+SEND_MAX_RETRIES = 3
+SEND_RETRY_BASE_DELAY = 30
+SEND_RETRY_MAX_DELAY = 600
+
+# Number of worker processes rendering emails while sending (0 = render in the sending threads)
+# and how many recipients are handed to a worker at a time
+RENDER_PROCESSES = 0
+RENDER_BATCH_SIZE = 200
+
+# Additional relay servers used with --async, as "host:port" (same login as in credentials.env),
+# e.g. ["smtp2.example.com:465", "smtp3.example.com:465"]. The server of credentials.env is always used.
+SMTP_RELAYS = []
+
+# Number of emails in flight at the same time with --async (can be overridden with --concurrency)
+# and the maximum number of sessions opened to each relay server
+ASYNC_SEND_CONCURRENCY = 100
+ASYNC_CONNECTIONS_PER_RELAY = 10
+
+# Number of rendered emails kept for reuse by recipients whose template data is identical (0 = off)
+RENDER_CACHE_SIZE = 10000
+
+# =============================================================================
+# LOGGING SETTINGS
+# =============================================================================
+
+# Console output level: "INFO" shows every recipient, "WARNING" only problems and the final summary
+LOG_LEVEL = "INFO"
+
+# File receiving every log line and the run metrics as JSON lines (None = off, or use --log-json FILE)
+LOG_JSON_FILE = None
+
+# Log the sent/failed/retried/bytes counters every this many seconds during a run (0 = off)
+METRICS_INTERVAL = 0
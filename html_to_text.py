@@ -0,0 +1,92 @@
+import re
+from html import unescape
+from html.entities import html5
+from html.parser import HTMLParser
+
+# Elements whose text BeautifulSoup's get_text() leaves out
+SKIPPED_ELEMENTS = ('script', 'style', 'template')
+
+_LEADING_DECIMAL = re.compile(r'^([0-9]+)(.*)$', re.DOTALL)
+_LEADING_HEX = re.compile(r'^([0-9a-fA-F]+)(.*)$', re.DOTALL)
+
+
+class PlainTextExtractor(HTMLParser):
+    """
+    Streaming HTML to plain text conversion that produces the same result as
+    BeautifulSoup(html, 'html.parser').get_text(separator='\\n', strip=True)
+    without building a document tree.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.lines = []
+        self._pending = []
+        self._skip_depth = 0
+
+    def _flush(self):
+        # Adjacent pieces of character data form one text node, just like in the parsed tree
+        if self._pending:
+            text = ''.join(self._pending).strip()
+            self._pending = []
+            if text and not self._skip_depth:
+                self.lines.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in SKIPPED_ELEMENTS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in SKIPPED_ELEMENTS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_entityref(self, name):
+        # Unknown entities are kept as literal text without the semicolon
+        self._pending.append(html5.get(name + ';', '&' + name))
+
+    def handle_charref(self, name):
+        if name[:1] in ('x', 'X'):
+            digits, pattern, prefix = name[1:], _LEADING_HEX, '&#x'
+        else:
+            digits, pattern, prefix = name, _LEADING_DECIMAL, '&#'
+        match = pattern.match(digits)
+        if match is None:
+            self._pending.append(name)
+            return
+        self._pending.append(unescape(prefix + match.group(1) + ';'))
+        self._pending.append(match.group(2))
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        # CDATA sections are kept as text of their own
+        if data.upper().startswith('CDATA['):
+            self._pending.append(data[len('CDATA['):])
+            self._flush()
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def html_to_text(html_text):
+    """Return the plain text alternative of an HTML email body, one text node per line"""
+    extractor = PlainTextExtractor()
+    extractor.feed(html_text)
+    extractor.close()
+    return '\n'.join(extractor.lines)
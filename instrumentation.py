@@ -0,0 +1,225 @@
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# Stages of the pipeline that are timed, in the order they happen for each email
+STAGES = (
+    "csv_load",
+    "preflight",
+    "template_render",
+    "condition_eval",
+    "html_to_text",
+    "mime_build",
+    "smtp_connect",
+    "smtp_send",
+)
+
+# Log levels, as in the logging module
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+_LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+
+# Class replacing the print() status lines of the pipeline with leveled log lines.
+# Console lines are written to sys.stdout exactly like print() did, so redirect_stdout() still
+# silences them; the optional JSON-lines sink gets every line down to DEBUG with its extra fields.
+# This is deliberately much lighter than the logging module: a skipped line costs one
+# comparison and a written one a single sys.stdout.write().
+class Logger:
+    def __init__(self, level=INFO):
+        self.level = level
+        self.sink = None
+        # Lowest level that is written anywhere - everything below returns immediately
+        self.threshold = level
+        self._lock = threading.Lock()
+
+    def set_level(self, level):
+        self.level = LEVELS[level.upper()] if isinstance(level, str) else level
+        self._update_threshold()
+
+    def open_sink(self, path):
+        """Append JSON lines to path - line buffered, so the file can be followed during a run"""
+        self.close_sink()
+        self.sink = open(path, "a", encoding="utf-8", buffering=1)
+        self._update_threshold()
+
+    def close_sink(self):
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+        self._update_threshold()
+
+    def detach_sink(self):
+        """Stop writing into the sink without closing it - for worker processes that inherited it"""
+        self.sink = None
+        self._update_threshold()
+
+    def _update_threshold(self):
+        self.threshold = min(self.level, DEBUG) if self.sink is not None else self.level
+
+    def enabled(self, level):
+        return level >= self.threshold
+
+    def log(self, level, message, *args, **fields):
+        """Log message % args; keyword arguments are extra fields of the JSON line"""
+        if level >= self.threshold:
+            self._write(level, message, args, fields)
+
+    def _write(self, level, message, args, fields):
+        if args:
+            message = message % args
+        if level >= self.level:
+            # A single write keeps each line whole, also with several sending threads.
+            # sys.stdout is looked up every time, so redirect_stdout() still applies
+            sys.stdout.write(message + "\n")
+        if self.sink is not None:
+            entry = {"time": time.time(), "level": _LEVEL_NAMES.get(level, level), "message": message}
+            entry.update(fields)
+            line = json.dumps(entry, default=str)
+            with self._lock:
+                self.sink.write(line + "\n")
+
+    # The level methods check the threshold themselves and hand args and fields on as they
+    # are, so a skipped line costs one comparison and a logged one no extra packing
+
+    def debug(self, message, *args, **fields):
+        if DEBUG >= self.threshold:
+            self._write(DEBUG, message, args, fields)
+
+    def info(self, message, *args, **fields):
+        if INFO >= self.threshold:
+            self._write(INFO, message, args, fields)
+
+    def warning(self, message, *args, **fields):
+        if WARNING >= self.threshold:
+            self._write(WARNING, message, args, fields)
+
+    def error(self, message, *args, **fields):
+        if ERROR >= self.threshold:
+            self._write(ERROR, message, args, fields)
+
+
+# Shared logger of all modules
+logger = Logger()
+
+
+def setup_logging(level="INFO", json_file=None):
+    """Set the console log level and optionally open a JSON-lines sink"""
+    logger.set_level(level)
+    if json_file:
+        logger.open_sink(json_file)
+
+
+# Class collecting counters (sent, failed, retried, bytes on the wire, ...) and
+# per-stage timers for a run. All methods are thread-safe.
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = Counter()
+        # stage -> [number of timings, total seconds, longest single timing]
+        self.timers = {}
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def add_time(self, stage, seconds, count=1, longest=None):
+        with self._lock:
+            timer = self.timers.get(stage)
+            if timer is None:
+                timer = self.timers[stage] = [0, 0.0, 0.0]
+            timer[0] += count
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds if longest is None else longest)
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the body of a with block as one occurrence of stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """A JSON-serializable copy of all counters and timers"""
+        with self._lock:
+            return {
+                "elapsed_seconds": time.time() - self.started,
+                "counters": dict(self.counters),
+                "stages": {
+                    stage: {"count": count, "total_seconds": total, "max_seconds": longest}
+                    for stage, (count, total, longest) in self.timers.items()
+                },
+            }
+
+    def merge(self, snapshot):
+        """Add the counters and timers of a snapshot, e.g. one taken in a worker process"""
+        for name, amount in snapshot["counters"].items():
+            self.increment(name, amount)
+        for stage, timer in snapshot["stages"].items():
+            self.add_time(stage, timer["total_seconds"], timer["count"], timer["max_seconds"])
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters.clear()
+            self.timers.clear()
+
+    def report_lines(self):
+        """Human readable summary of the counters and stage timers"""
+        snapshot = self.snapshot()
+        lines = ["[METRICS] Counters:"]
+        for name, amount in sorted(snapshot["counters"].items()):
+            lines.append(f"  - {name}: {amount}")
+        lines.append("[METRICS] Stage timings:")
+        known_stages = [stage for stage in STAGES if stage in snapshot["stages"]]
+        other_stages = sorted(set(snapshot["stages"]) - set(STAGES))
+        for stage in known_stages + other_stages:
+            timer = snapshot["stages"][stage]
+            average = timer["total_seconds"] / timer["count"] * 1e3 if timer["count"] else 0.0
+            lines.append(f"  - {stage:16s} {timer['count']:8d} x  avg {average:9.3f} ms"
+                         f"  max {timer['max_seconds'] * 1e3:9.3f} ms  total {timer['total_seconds']:9.3f} s")
+        return lines
+
+    def log(self):
+        """Write a metrics event with the full snapshot to the JSON-lines sink"""
+        snapshot = self.snapshot()
+        logger.debug("[METRICS] %s", _counter_line(snapshot["counters"]), event="metrics", metrics=snapshot)
+
+
+def _counter_line(counters):
+    return " ".join(f"{name}={amount}" for name, amount in sorted(counters.items()))
+
+
+# Metrics of this process
+METRICS = Metrics()
+
+
+# Class logging the metrics every few seconds during a long campaign, in a background thread
+class MetricsReporter:
+    def __init__(self, metrics, interval):
+        self.metrics = metrics
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            snapshot = self.metrics.snapshot()
+            logger.info("[METRICS] %s", _counter_line(snapshot["counters"]), event="metrics", metrics=snapshot)
@@ -1,89 +1,377 @@
 import os
-import pandas as pd
-import smtplib, ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
-from newPage import newPage
-
-def load_recipients(csv_file="exampleRecipient.csv"):
-    """Load recipients from CSV file and return pandas DataFrame"""
+import argparse
+from contextlib import nullcontext, closing
+from newPage import render_email, referenced_columns, column_references, RENDER_CACHE
+from recipient_record import iter_records
+from send_engine import run_sends
+from mime_build import build_message
+from csv_records import read_csv_records, is_small_csv
+from instrumentation import logger, LEVELS, METRICS, MetricsReporter, setup_logging
+from recipient_validation import RecipientValidator, report_rejects
+from columnar_input import (
+    columnar_format,
+    clean_name,
+    file_columns,
+    pyarrow_available,
+    read_table,
+    iter_batches,
+    batch_frames,
+    clean_table,
+    fresh_sidecar,
+    sidecar_path,
+    write_sidecar
+)
+from preview import (
+    SAMPLE_MODES,
+    sample_recipients,
+    condition_summary,
+    print_condition_summary,
+    write_previews,
+    campaign_writer,
+    DirectoryWriter,
+    ArchiveWriter
+)
+from email_config import (
+    SMTP_POOL_SIZE,
+    SMTP_MAX_MESSAGES_PER_CONNECTION,
+    SMTP_PIPELINING,
+    SEND_WORKERS,
+    MAX_CONCURRENT_SENDS_PER_DOMAIN,
+    CSV_CHUNK_SIZE,
+    CSV_SIDECAR_CACHE,
+    SMALL_CSV_MAX_BYTES,
+    CHECK_MX_RECORDS,
+    DELIVERY_JOURNAL_FILE,
+    SEND_RATE_LIMIT,
+    SEND_RATE_BURST,
+    SEND_MIN_RATE,
+    SEND_MAX_RETRIES,
+    SEND_RETRY_BASE_DELAY,
+    SEND_RETRY_MAX_DELAY,
+    RENDER_PROCESSES,
+    RENDER_BATCH_SIZE,
+    SMTP_RELAYS,
+    ASYNC_SEND_CONCURRENCY,
+    ASYNC_CONNECTIONS_PER_RELAY,
+    LOG_LEVEL,
+    LOG_JSON_FILE,
+    METRICS_INTERVAL
+)
+
+def clean_recipients(df):
+    """Remove quotes and extra spaces from the column names and string values of a recipient DataFrame"""
+    # Clean column names (remove quotes and extra spaces)
+    df.columns = df.columns.str.strip().str.replace('"', '')
+    
+    # Clean all string data (remove quotes and extra spaces)
+    for col in df.columns:
+        if df[col].dtype == 'object':  # String columns
+            df[col] = df[col].astype(str).str.strip().str.replace('"', '')
+    return df
+
+def csv_usecols(columns):
+    """usecols for pandas.read_csv: parse only the given columns, matched by their cleaned header names (None = all)"""
+    if columns is None:
+        return None
+    return lambda name: clean_name(name) in columns
+
+def read_header(csv_file):
+    """Cleaned column names of a recipient list, without reading any rows"""
+    if columnar_format(csv_file):
+        return file_columns(csv_file)
+    import pandas as pd
+    return [clean_name(name) for name in pd.read_csv(csv_file, nrows=0).columns]
+
+def recipient_columns():
+    """Columns a recipient list has to provide: Name, Mail and all columns the templates and conditions read (None = all)"""
+    columns = referenced_columns()
+    return None if columns is None else columns | {'Name', 'Mail'}
+
+def check_columns(header, csv_file, templates=None):
+    """
+    Report the columns used by the templates and conditions that the recipient list lacks,
+    before anything is rendered. Returns False if the Name or Mail column is missing.
+    templates is the TemplateSet of a campaign (None = the one of email_config.py).
+    """
+    header = set(header)
+    required_missing = [column for column in ('Name', 'Mail') if column not in header]
+    for column in required_missing:
+        logger.error("Error: %s has no '%s' column", csv_file, column)
+    references = column_references() if templates is None else templates.column_references()
+    users_of = f"campaign '{templates.name}'" if templates is not None and templates.name else None
+    for column, users in (references or {}).items():
+        if column not in header and column not in required_missing:
+            logger.warning("[WARNING] Column '%s' is not in %s but used by %s%s", column, csv_file,
+                           f"{users_of}: " if users_of else "", ", ".join(users))
+    return not required_missing
+
+def read_recipients(csv_file, columns=None, use_cache=CSV_SIDECAR_CACHE):
+    """
+    Read and clean a recipient list and return (DataFrame, file actually read).
+    Parquet, Feather and Arrow IPC files are memory-mapped and only `columns` are read from them.
+    A CSV file is parsed and cleaned once and then cached in a columnar sidecar next to it,
+    which later runs memory-map instead as long as the CSV file is unchanged.
+    """
+    import pandas as pd
+    
+    if columnar_format(csv_file):
+        return clean_table(read_table(csv_file, columns)).to_pandas(), csv_file
+    sidecar = fresh_sidecar(csv_file, columns) if use_cache else None
+    if sidecar is not None:
+        return read_table(sidecar, columns).to_pandas(), sidecar
+    
+    # Unused columns are skipped by the parser instead of being converted and cleaned
+    df = clean_recipients(pd.read_csv(csv_file, usecols=csv_usecols(columns)))
+    if use_cache and pyarrow_available():
+        try:
+            write_sidecar(csv_file, df, read_header(csv_file))
+        except Exception as e:
+            logger.warning("[WARNING] Could not cache %s as a columnar file: %s", csv_file, e)
+    return df, csv_file
+
+def load_recipients(csv_file="exampleRecipient.csv", columns=None, use_cache=CSV_SIDECAR_CACHE):
+    """Load recipients from a CSV, Parquet, Feather or Arrow IPC file and return pandas DataFrame"""
     try:
-        # Read CSV file with proper handling of spaces in column names
-        df = pd.read_csv(csv_file)
-        # Clean column names (remove quotes and extra spaces)
-        df.columns = df.columns.str.strip().str.replace('"', '')
-        
-        # Clean all string data (remove quotes and extra spaces)
-        for col in df.columns:
-            if df[col].dtype == 'object':  # String columns
-                df[col] = df[col].astype(str).str.strip().str.replace('"', '')
-        
-        print(f"Loaded {len(df)} recipients from {csv_file}")
-        print("Columns:", df.columns.tolist())
+        with METRICS.timer("csv_load"):
+            df, source = read_recipients(csv_file, columns, use_cache)
+        
+        logger.info("Loaded %d recipients from %s", len(df), csv_file)
+        if source != csv_file:
+            logger.debug("Read the cached columnar copy %s", source)
+        logger.info("Columns: %s", df.columns.tolist())
         return df
     except FileNotFoundError:
-        print(f"Error: Could not find {csv_file}")
+        logger.error("Error: Could not find %s", csv_file)
         return None
     except Exception as e:
-        print(f"Error loading CSV: {e}")
+        logger.error("Error loading CSV: %s", e)
+        return None
+
+def load_recipient_records(csv_file, columns=None):
+    """
+    Load a small CSV file with the stdlib csv module and return (column names, list of RecipientRecord),
+    or None if the file is too big or needs pandas - load_recipients() is used for it then.
+    Importing pandas takes longer than a whole run over a tiny list, so these runs never load it.
+    """
+    if columnar_format(csv_file) or not is_small_csv(csv_file, SMALL_CSV_MAX_BYTES):
         return None
+    try:
+        with METRICS.timer("csv_load"):
+            names, records = read_csv_records(csv_file, columns)
+    except Exception as e:
+        # pandas reads the file instead and reports any real error the usual way
+        logger.debug("Reading %s with pandas: %s", csv_file, e)
+        return None
+    
+    logger.info("Loaded %d recipients from %s", len(records), csv_file)
+    logger.info("Columns: %s", names)
+    return names, records
+
+def validate_recipients(recipients, validator):
+    """
+    Drop and report the recipients the pre-flight check rejects, so they never reach process_personalized_email.
+    recipients is a DataFrame or a list of recipient records.
+    """
+    with METRICS.timer("preflight"):
+        if isinstance(recipients, list):
+            valid, rejects = validator.validate_records(recipients)
+        else:
+            valid, rejects = validator.validate(recipients)
+    if rejects:
+        METRICS.increment("rejected", len(rejects))
+        report_rejects(rejects)
+    return valid
+
+def stream_recipients(csv_file="exampleRecipient.csv", chunksize=CSV_CHUNK_SIZE, validator=None, columns=None):
+    """
+    Open a recipient list for streaming and return a generator of cleaned recipient rows.
+    Only one chunk of the file is held in memory at a time.
+    With a RecipientValidator every chunk is checked before its rows are handed out.
+    """
+    import pandas as pd
+    
+    try:
+        # Opening the reader already parses the header, so a missing or broken file is reported here
+        # Columnar files come in already cleaned chunks, the chunks of a CSV file are cleaned as they are read
+        clean = False
+        if columnar_format(csv_file):
+            chunks = batch_frames(iter_batches(csv_file, chunksize, columns))
+        elif CSV_SIDECAR_CACHE and fresh_sidecar(csv_file, columns):
+            chunks = batch_frames(iter_batches(sidecar_path(csv_file), chunksize, columns), clean=False)
+        else:
+            chunks = pd.read_csv(csv_file, chunksize=chunksize, usecols=csv_usecols(columns))
+            clean = True
+    except FileNotFoundError:
+        logger.error("Error: Could not find %s", csv_file)
+        return None
+    except Exception as e:
+        logger.error("Error loading CSV: %s", e)
+        return None
+    
+    logger.info("Streaming recipients from %s in chunks of %d rows", csv_file, chunksize)
+    return _iter_recipient_chunks(chunks, validator, clean)
+
+def _iter_recipient_chunks(chunks, validator=None, clean=True):
+    with closing(chunks):
+        while True:
+            with METRICS.timer("csv_load"):
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                if clean:
+                    chunk = clean_recipients(chunk)
+            if validator is not None:
+                chunk = validate_recipients(chunk, validator)
+            yield from iter_records(chunk)
+
+def render_recipient(recipient_row, templates=None):
+    """
+    Render the email of a recipient and report which conditions apply - returns a RenderedEmail.
+    templates is the TemplateSet of a campaign (None = the one of email_config.py).
+    """
+    name = recipient_row['Name']
+    email = recipient_row['Mail']
+    
+    logger.info("Processing email for %s (%s)", name, email)
+    
+    # Create personalized email content with all recipient data and process all
+    # conditional content automatically - identical emails are reused from the render cache
+    rendered = render_email(name, recipient_row, templates)
+    applied_conditions = rendered.applied_conditions
+    if applied_conditions:
+        logger.info("  - Applied conditions: %s", ', '.join(applied_conditions))
+    else:
+        logger.info("  - No conditions applied")
+    return rendered
+
+def wire_message(sender_email, email, name, rendered, skeleton=None):
+    """The finished message of a rendered email, ready for sendmail"""
+    with METRICS.timer("mime_build"):
+        if skeleton is not None:
+            return skeleton.render_cached(email, name, rendered)
+        return build_message(sender_email, email, name, rendered.plain_text, rendered.html_text).as_string()
 
-def process_personalized_email(recipient_row, test_mode=False, sender_email=None, password=None, sender_server=None, port=None):
-    """Process a personalized email for a single recipient - either send or preview based on test_mode"""
+def process_personalized_email(recipient_row, test_mode=False, sender_email=None, smtp_pool=None, journal=None, scheduler=None, skeleton=None, templates=None):
+    """
+    Process a personalized email for a single recipient - either send or preview based on test_mode.
+    recipient_row can be any mapping of column name to value, e.g. a RecipientRecord, dict or pandas Series.
+    Returns (success, error_msg); success is None when a temporary failure was queued for a retry.
+    """
     try:
         # Extract recipient information
         name = recipient_row['Name']
         email = recipient_row['Mail']
         
-        print(f"Processing email for {name} ({email})")
-        
-        # Create personalized email content with all recipient data
-        email_page = newPage(recipient_name=name, recipient_data=dict(recipient_row))
-        
-        # Process all conditional content automatically
-        applied_conditions = email_page.processConditionalContent()
-        if applied_conditions:
-            print(f"  - Applied conditions: {', '.join(applied_conditions)}")
-        else:
-            print(f"  - No conditions applied")
-        
-        # Generate email content
-        plain_text, html_text = email_page.returnPage()
+        rendered = render_recipient(recipient_row, templates)
         
         if test_mode:
             # Test mode - just display the email content
-            print(f"\n--- Email Preview for {name} ---")
-            print(plain_text)
-            print("-" * 50)
+            logger.info("\n--- Email Preview for %s ---", name)
+            logger.info("%s", rendered.plain_text)
+            logger.info("-" * 50)
+            METRICS.increment("previewed")
             return True, None
         else:
             # Send mode - actually send the email
-            # Create email message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = f"Personal message for {name}"
-            message["From"] = sender_email
-            message["To"] = email
-            
-            # Attach plain text and HTML parts
-            part1 = MIMEText(plain_text, "plain", "utf-8")
-            part2 = MIMEText(html_text, "html", "utf-8")
-            message.attach(part1)
-            message.attach(part2)
-            
-            # Send email
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(sender_server, int(port), context=context) as server:
-                server.login(sender_email, password)
-                server.sendmail(sender_email, email, message.as_string())
-            
-            print(f"  [SUCCESS] Email sent successfully to {name} ({email})")
-            return True, None
+            message = wire_message(sender_email, email, name, rendered, skeleton)
+            return deliver_email(recipient_row, message, sender_email, smtp_pool, journal, scheduler)
         
     except Exception as e:
         error_msg = f"Failed to process email for {name}: {e}"
-        print(f"  [FAILED] {error_msg}")
-        return False, error_msg
+        return record_failure(email, name, error_msg, None if test_mode else journal)
+
+def record_failure(email, name, error_msg, journal=None):
+    """Report a recipient whose email could not be sent - returns (False, error_msg)"""
+    METRICS.increment("failed")
+    logger.error("  [FAILED] %s", error_msg, event="failed", recipient=email)
+    if journal is not None:
+        journal.record_failed(email, name, error_msg)
+    return False, error_msg
+
+def record_delivery(recipient, message, journal=None, scheduler=None):
+    """Report a delivered email - returns (True, None)"""
+    name = recipient['Name']
+    email = recipient['Mail']
+    if scheduler is not None:
+        scheduler.record_success(recipient)
+    if journal is not None:
+        journal.record_sent(email, name)
+    
+    METRICS.increment("sent")
+    METRICS.increment("bytes_on_wire", len(message))
+    logger.info("  [SUCCESS] Email sent successfully to %s (%s)", name, email, event="sent", recipient=email)
+    return True, None
+
+def record_delivery_error(recipient, error, journal=None, scheduler=None):
+    """
+    Report a failed send. Temporary failures are queued on the scheduler for a retry and return (None, error_msg),
+    everything else is recorded as failed and returns (False, error_msg).
+    """
+    name = recipient['Name']
+    email = recipient['Mail']
+    error_msg = f"Failed to process email for {name}: {error}"
+    if scheduler is not None and scheduler.retry_later(recipient, error):
+        METRICS.increment("retried")
+        logger.warning("  [RETRY] Temporary failure for %s (%s), will try again later: %s", name, email, error,
+                       event="retried", recipient=email)
+        return None, error_msg
+    return record_failure(email, name, error_msg, journal)
+
+def deliver_email(recipient, message, sender_email, smtp_pool, journal=None, scheduler=None):
+    """
+    Send a finished message to a recipient and record the outcome.
+    Returns (success, error_msg) like process_personalized_email.
+    """
+    try:
+        # Send email on one of the already authenticated pooled sessions
+        if scheduler is not None:
+            scheduler.acquire()
+        smtp_pool.sendmail(sender_email, recipient['Mail'], message)
+    except Exception as e:
+        return record_delivery_error(recipient, e, journal, scheduler)
+    return record_delivery(recipient, message, journal, scheduler)
+
+def send_rendered_email(rendered, sender_email, smtp_pool, journal=None, scheduler=None):
+    """Send a message rendered by the render farm - returns (success, error_msg) like process_personalized_email"""
+    if rendered['error'] is not None:
+        return record_failure(rendered['Mail'], rendered['Name'], rendered['error'], journal)
+    return deliver_email(rendered, rendered['message'], sender_email, smtp_pool, journal, scheduler)
+
+async def deliver_email_async(recipient, message, sender_email, smtp_pool, journal=None, scheduler=None):
+    """
+    deliver_email() for the asyncio send path, with an AsyncSMTPPool.
+    The journal is written in a worker thread, because every entry waits for the disk.
+    """
+    import asyncio
+    
+    try:
+        if scheduler is not None:
+            await scheduler.acquire_async()
+        await smtp_pool.sendmail(sender_email, recipient['Mail'], message)
+    except Exception as e:
+        return await asyncio.to_thread(record_delivery_error, recipient, e, journal, scheduler)
+    return await asyncio.to_thread(record_delivery, recipient, message, journal, scheduler)
+
+async def process_personalized_email_async(recipient_row, sender_email, smtp_pool, journal=None, scheduler=None, skeleton=None):
+    """Render and send the email of one recipient on the asyncio send path - returns (success, error_msg)"""
+    import asyncio
+    
+    name = recipient_row['Name']
+    email = recipient_row['Mail']
+    try:
+        message = wire_message(sender_email, email, name, render_recipient(recipient_row), skeleton)
+    except Exception as e:
+        error_msg = f"Failed to process email for {name}: {e}"
+        return await asyncio.to_thread(record_failure, email, name, error_msg, journal)
+    return await deliver_email_async(recipient_row, message, sender_email, smtp_pool, journal, scheduler)
+
+async def send_rendered_email_async(rendered, sender_email, smtp_pool, journal=None, scheduler=None):
+    """send_rendered_email() for the asyncio send path"""
+    import asyncio
+    
+    if rendered['error'] is not None:
+        return await asyncio.to_thread(record_failure, rendered['Mail'], rendered['Name'], rendered['error'], journal)
+    return await deliver_email_async(rendered, rendered['message'], sender_email, smtp_pool, journal, scheduler)
 
 def confirm_send():
     """Ask for user confirmation before sending emails"""
@@ -109,75 +397,332 @@ def confirm_send():
         else:
             print("Please enter 'yes' or 'no'")
 
+def parse_arguments(argv=None):
+    """Parse the command line options"""
+    parser = argparse.ArgumentParser(description="Send personalized emails to the recipients of a CSV file")
+    # 'python main.py send' is still accepted for backwards compatibility
+    parser.add_argument("mode", nargs="?", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--send", "-s", action="store_true",
+                        help="actually send the emails (default is test mode)")
+    parser.add_argument("--recipients", default="exampleRecipient.csv",
+                        help="recipient list: a CSV, Parquet (.parquet), Feather or Arrow IPC (.feather/.arrow) file")
+    parser.add_argument("--batch", metavar="MANIFEST", default=None,
+                        help="send several campaigns listed in a JSON manifest over one recipient load and SMTP pool")
+    parser.add_argument("--workers", "-w", type=int, default=SEND_WORKERS,
+                        help="number of emails rendered and sent in parallel")
+    parser.add_argument("--per-domain", type=int, default=MAX_CONCURRENT_SENDS_PER_DOMAIN,
+                        help="maximum number of parallel sends to the same recipient domain (0 = no limit)")
+    parser.add_argument("--async", dest="async_send", action="store_true",
+                        help="send with non-blocking I/O on asyncio, spread over all relay servers (send mode only)")
+    parser.add_argument("--concurrency", type=int, default=ASYNC_SEND_CONCURRENCY,
+                        help="number of emails in flight at the same time with --async")
+    parser.add_argument("--stream", action="store_true",
+                        help="read the CSV file in chunks instead of loading it completely first")
+    parser.add_argument("--render-processes", type=int, default=RENDER_PROCESSES,
+                        help="render the emails in this many worker processes while sending (send mode only, 0 = off)")
+    parser.add_argument("--check-mx", action="store_true", default=CHECK_MX_RECORDS,
+                        help="reject recipients whose domain has no mail server (one DNS lookup per domain)")
+    parser.add_argument("--rejects", default=None,
+                        help="write the recipients rejected by the pre-flight check into this CSV file")
+    parser.add_argument("--preview-dir", default=None,
+                        help="test mode: write the HTML and text of every email into this directory instead of printing it")
+    parser.add_argument("--preview-archive", default=None,
+                        help="test mode: write the HTML and text of every email into this zip archive")
+    parser.add_argument("--sample", choices=SAMPLE_MODES, default=None,
+                        help="test mode: only preview the first N, N random or one recipient per combination of conditions")
+    parser.add_argument("--sample-size", type=int, default=10,
+                        help="number of recipients previewed with --sample first/random (default 10)")
+    parser.add_argument("--summary-only", action="store_true",
+                        help="test mode: only show how many recipients get each condition")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip recipients who already received this campaign according to the delivery journal")
+    parser.add_argument("--campaign", default=None,
+                        help="campaign name used in the delivery journal (default: hash of email_config.py and the CSV name)")
+    parser.add_argument("--log-level", default=LOG_LEVEL, choices=list(LEVELS), type=str.upper,
+                        help="console output level - WARNING hides the per-recipient status lines")
+    parser.add_argument("--log-json", default=LOG_JSON_FILE,
+                        help="also write every log line and the metrics as JSON lines to this file")
+    parser.add_argument("--metrics", action="store_true",
+                        help="show the counters and the time spent in each stage at the end of the run")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL,
+                        help="log the counters every this many seconds during the run (0 = off)")
+    args = parser.parse_args(argv)
+    args.send = args.send or args.mode.lower() == "send"
+    return args
+
 def main():
     """Main function to orchestrate the email sending process"""
-    import sys
+    args = parse_arguments()
+    setup_logging(args.log_level, args.log_json)
+    validator = RecipientValidator(check_mx=args.check_mx)
+    try:
+        if args.batch:
+            run_batch(args, validator)
+        else:
+            run(args, validator)
+    finally:
+        if args.rejects:
+            validator.write_rejects(args.rejects)
+        METRICS.log()
+        logger.close_sink()
+    if args.metrics:
+        print("\n".join(METRICS.report_lines()))
+
+def relay_servers(sender_server, port):
+    """The relay server of credentials.env followed by the additional SMTP_RELAYS, as (host, port) pairs"""
+    relays = [(sender_server, int(port))]
+    for relay in SMTP_RELAYS:
+        host, _, relay_port = relay.rpartition(':')
+        relays.append((host, int(relay_port)) if host else (relay_port, int(port)))
+    return relays
+
+async def send_all_async(recipients, args, sender_email, smtp_pool, journal, scheduler, skeleton):
+    """Send mode on asyncio: many concurrent deliveries on a few threads, see --async"""
+    from async_send_engine import run_sends_async
+    
+    async def process_recipient(recipient):
+        if args.render_processes > 0:
+            result = await send_rendered_email_async(
+                recipient, sender_email, smtp_pool,
+                journal=journal, scheduler=scheduler
+            )
+        else:
+            result = await process_personalized_email_async(
+                recipient, sender_email, smtp_pool,
+                journal=journal, scheduler=scheduler, skeleton=skeleton
+            )
+        logger.info("")  # Empty line for readability
+        return result
+    
+    try:
+        return await run_sends_async(
+            recipients, process_recipient,
+            concurrency=args.concurrency, per_domain_limit=args.per_domain,
+            scheduler=scheduler
+        )
+    finally:
+        await smtp_pool.close()
+
+def load_run_recipients(args, validator, columns, check, as_frame=False):
+    """
+    Load and validate the recipient list of a run - either the whole file up front or lazily chunk by chunk.
+    check(header) reports missing columns and returns False if the run cannot go on.
+    With as_frame a list that was loaded into a DataFrame is returned as that DataFrame instead of records.
+    Returns (recipients, recipient count) or None if the list could not be used.
+    """
+    csv_file = args.recipients
+    # Malformed and duplicate addresses are dropped right away instead of failing during the send
+    if args.stream:
+        recipients = stream_recipients(csv_file, validator=validator, columns=columns)
+        if recipients is None or not check(read_header(csv_file)):
+            return None
+        return recipients, "all"
+    # Small CSV files are read without pandas, everything else into a DataFrame
+    loaded = load_recipient_records(csv_file, columns)
+    if loaded is not None:
+        header, records = loaded
+        if not check(header):
+            return None
+        recipients = validate_recipients(records, validator)
+        return recipients, len(recipients)
+    recipients_df = load_recipients(csv_file, columns)
+    if recipients_df is None or not check(recipients_df.columns):
+        return None
+    recipients_df = validate_recipients(recipients_df, validator)
+    if as_frame:
+        return recipients_df, len(recipients_df)
+    return iter_records(recipients_df), len(recipients_df)
+
+def open_send_session(workers, async_send=False):
+    """
+    Read the credentials and set up everything sending needs, shared by all recipients of a run.
+    Returns (sender_email, smtp_pool, skeleton, scheduler) or None if credentials.env is incomplete.
+    """
+    from dotenv import load_dotenv
+    from send_scheduler import SendScheduler
+    from mime_fastpath import MessageSkeleton
+    
+    # Load environment variables for sending
+    load_dotenv("credentials.env")
+    
+    sender_email = os.getenv("SenderMail")
+    password = os.getenv("SenderPassword")
+    sender_server = os.getenv("SenderServer")
+    port = os.getenv("SenderPort")
     
+    # Validate required environment variables
+    if not all([sender_email, password, sender_server, port]):
+        logger.error("[ERROR] Missing required environment variables in credentials.env")
+        logger.error("Required: SenderMail, SenderPassword, SenderServer, SenderPort")
+        logger.error("Create a credentials.env file based on credentials.env_template")
+        return None
+    
+    if async_send:
+        from async_smtp import AsyncSMTPPool
+        
+        # Non-blocking sessions spread over all configured relay servers
+        smtp_pool = AsyncSMTPPool(
+            relay_servers(sender_server, port), sender_email, password,
+            connections_per_relay=ASYNC_CONNECTIONS_PER_RELAY,
+            max_messages_per_connection=SMTP_MAX_MESSAGES_PER_CONNECTION,
+            pipelining=SMTP_PIPELINING
+        )
+    else:
+        from smtp_pool import SMTPConnectionPool
+        
+        # One pool of logged-in sessions is reused for the whole run,
+        # with at least one session per worker so parallel sends do not queue up
+        smtp_pool = SMTPConnectionPool(
+            sender_server, port, sender_email, password,
+            pool_size=max(SMTP_POOL_SIZE, workers),
+            max_messages_per_connection=SMTP_MAX_MESSAGES_PER_CONNECTION,
+            pipelining=SMTP_PIPELINING
+        )
+    
+    # Invariant MIME structure and headers, encoded once for all recipients
+    skeleton = MessageSkeleton(sender_email)
+    
+    # Paces the sends and retries temporary SMTP failures with backoff
+    scheduler = SendScheduler(
+        rate_limit=SEND_RATE_LIMIT, burst=SEND_RATE_BURST, min_rate=SEND_MIN_RATE,
+        max_retries=SEND_MAX_RETRIES,
+        retry_base_delay=SEND_RETRY_BASE_DELAY, retry_max_delay=SEND_RETRY_MAX_DELAY
+    )
+    return sender_email, smtp_pool, skeleton, scheduler
+
+def run(args, validator):
+    """Load the recipients and preview or send the emails as selected by the command line options"""
     # Default is test mode - send mode requires explicit --send flag
-    send_mode = len(sys.argv) > 1 and sys.argv[1].lower() in ['send', '--send', '-s']
-    test_mode = not send_mode
+    test_mode = not args.send
+    workers = max(1, args.workers)
+    csv_file = args.recipients
+    # Columns nobody reads are not loaded at all (from columnar files) or dropped right after parsing
+    columns = recipient_columns()
     
-    # Load recipients
-    recipients_df = load_recipients()
-    if recipients_df is None:
+    # The condition summary and the combinations sample evaluate a whole DataFrame at once
+    as_frame = test_mode and (args.summary_only or args.sample == 'combinations')
+    loaded = load_run_recipients(args, validator, columns, lambda header: check_columns(header, csv_file), as_frame)
+    if loaded is None:
         return
+    recipients, recipient_count = loaded
     
     if test_mode:
-        print("[TEST MODE] Generating sample emails without sending...")
-        print("=" * 60)
-        print("TIP: To actually send emails, run: python main.py --send")
-        print("=" * 60)
+        logger.info("[TEST MODE] Generating sample emails without sending...")
+        logger.info("=" * 60)
+        logger.info("TIP: To actually send emails, run: python main.py --send")
+        logger.info("=" * 60)
+        
+        if args.sample:
+            recipients = sample_recipients(recipients, args.sample, args.sample_size)
+        
+        if args.summary_only:
+            print_condition_summary(*condition_summary(recipients))
+            return
+        
+        if args.preview_dir or args.preview_archive:
+            if args.preview_archive:
+                writer = ArchiveWriter(args.preview_archive)
+            else:
+                writer = DirectoryWriter(args.preview_dir)
+            count = write_previews(recipients, writer)
+            logger.info("[TEST SUMMARY] Wrote previews of %d emails to %s", count, writer.path)
+            return
     else:
         # Send mode - require confirmation
         if not confirm_send():
             return
             
-        # Load environment variables for sending
-        load_dotenv("credentials.env")
-        
-        sender_email = os.getenv("SenderMail")
-        password = os.getenv("SenderPassword")
-        sender_server = os.getenv("SenderServer")
-        port = os.getenv("SenderPort")
-        
-        # Validate required environment variables
-        if not all([sender_email, password, sender_server, port]):
-            print("[ERROR] Missing required environment variables in credentials.env")
-            print("Required: SenderMail, SenderPassword, SenderServer, SenderPort")
-            print("Create a credentials.env file based on credentials.env_template")
+        # Only needed for sending - test runs start faster without loading them
+        from delivery_journal import DeliveryJournal, campaign_hash
+        
+        session = open_send_session(workers, args.async_send)
+        if session is None:
             return
+        sender_email, smtp_pool, skeleton, scheduler = session
         
-        print(f"\n[SEND MODE] Starting to send {len(recipients_df)} personalized emails...")
-        print("=" * 50)
+        # Every delivery is journaled so an interrupted run can be resumed with --resume
+        campaign = args.campaign or campaign_hash("email_config.py", csv_file)
+        journal = DeliveryJournal(DELIVERY_JOURNAL_FILE, campaign)
+        if journal.delivered:
+            if args.resume:
+                logger.info("[RESUME] Skipping %d recipients who already received campaign %s",
+                            len(journal.delivered), campaign)
+                recipients = (recipient for recipient in recipients
+                              if not journal.is_delivered(recipient['Mail']))
+            else:
+                logger.warning("[WARNING] %d recipients already received campaign %s",
+                               len(journal.delivered), campaign)
+                logger.warning("          Run with --resume to skip them")
+        
+        logger.info("\n[SEND MODE] Starting to send %s personalized emails...", recipient_count)
+        logger.info("=" * 50)
     
-    # Process emails for each recipient
-    successful_sends = 0
-    failed_sends = 0
-    failed_recipients = []
+    if not test_mode and args.render_processes > 0:
+        from render_farm import render_in_processes
+        
+        # Rendering is CPU bound - do it in worker processes and only send from this one
+        recipients = render_in_processes(
+            recipients, sender_email,
+            processes=args.render_processes, batch_size=RENDER_BATCH_SIZE
+        )
     
-    for index, recipient in recipients_df.iterrows():
-        if test_mode:
-            success, error_msg = process_personalized_email(recipient, test_mode=True)
+    def process_recipient(recipient):
+        if not test_mode and args.render_processes > 0:
+            result = send_rendered_email(
+                recipient, sender_email, smtp_pool,
+                journal=journal, scheduler=scheduler
+            )
+        elif test_mode:
+            result = process_personalized_email(recipient, test_mode=True)
         else:
-            success, error_msg = process_personalized_email(
+            result = process_personalized_email(
                 recipient, test_mode=False, 
-                sender_email=sender_email, password=password, 
-                sender_server=sender_server, port=port
+                sender_email=sender_email, smtp_pool=smtp_pool,
+                journal=journal, scheduler=scheduler, skeleton=skeleton
             )
-        
-        if success:
-            successful_sends += 1
-        else:
-            failed_sends += 1
-            failed_recipients.append((recipient['Name'], error_msg))
-        
-        print()  # Empty line for readability
+        logger.info("")  # Empty line for readability
+        return result
+    
+    # Process emails for each recipient - in parallel when more than one worker is configured
+    # Long campaigns can report their counters periodically while sending
+    reporter = MetricsReporter(METRICS, args.metrics_interval) if args.metrics_interval > 0 else nullcontext()
+    try:
+        with reporter:
+            if not test_mode and args.async_send:
+                import asyncio
+                summary = asyncio.run(send_all_async(
+                    recipients, args, sender_email, smtp_pool, journal, scheduler, skeleton
+                ))
+            else:
+                summary = run_sends(
+                    recipients, process_recipient,
+                    workers=workers, per_domain_limit=args.per_domain,
+                    scheduler=None if test_mode else scheduler
+                )
+    finally:
+        if not test_mode and not args.async_send:
+            smtp_pool.close()
+    
+    if test_mode:
+        successful_sends = summary.successful_sends
+        failed_sends = summary.failed_sends
+        failed_recipients = summary.failed_recipients
+    else:
+        # The journal knows about earlier, interrupted runs of this campaign as well
+        successful_sends, failed_sends, failed_recipients = journal.summary()
+        journal.close()
     
-    # Summary
+    logger.debug("[SUMMARY] %d successful, %d failed", successful_sends, failed_sends,
+                 event="summary", successful=successful_sends, failed=failed_sends,
+                 failed_recipients=failed_recipients)
+    
+    # Summary - always shown, whatever the log level
     print("=" * 50)
     if test_mode:
         print(f"[TEST SUMMARY] Email preview complete!")
-        print(f"[PROCESSED] Total previewed: {len(recipients_df)}")
+        print(f"[PROCESSED] Total previewed: {summary.total}")
+        if validator.rejected:
+            print(f"[REJECTED] Invalid or duplicate addresses: {validator.rejected}")
         print()
         print("Ready to send? Run: python main.py --send")
         print("Want to modify? Edit email_config.py or your CSV file")
@@ -189,9 +734,168 @@ def main():
             print(f"[FAILED RECIPIENTS]:")
             for name, error in failed_recipients:
                 print(f"  - {name}: {error}")
-        print(f"[TOTAL] Total: {len(recipients_df)}")
+        print(f"[TOTAL] Total: {successful_sends + failed_sends}")
+        if validator.rejected:
+            print(f"[REJECTED] Not sent because of invalid or duplicate addresses: {validator.rejected}")
+        print(f"[CACHE] Rendered emails reused: {RENDER_CACHE.hits}, rendered: {RENDER_CACHE.misses}")
         print()
         print("All done! Your personalized emails have been sent.")
 
+def run_batch(args, validator):
+    """
+    Preview or send several campaigns of a manifest (see --batch) in one run: the recipient list is
+    loaded and validated once, one SMTP pool and send scheduler serve all campaigns, and every
+    campaign keeps its own templates, delivery journal and summary.
+    """
+    from batch_runner import ManifestError, load_manifest, batch_columns, campaign_recipients, CampaignRecipient
+    
+    test_mode = not args.send
+    workers = max(1, args.workers)
+    try:
+        manifest_recipients, campaigns = load_manifest(args.batch)
+    except ManifestError as e:
+        logger.error("Error: %s", e)
+        return
+    csv_file = manifest_recipients or args.recipients
+    args.recipients = csv_file
+    if args.async_send or args.render_processes > 0:
+        logger.warning("[WARNING] --batch sends from threads in this process - --async and --render-processes are ignored")
+    
+    def check(header):
+        # Every campaign reports the columns it is missing; a missing Name or Mail stops the run,
+        # and so does a missing filter column - the campaign would quietly go to nobody
+        complete = all([check_columns(header, csv_file, campaign.templates) for campaign in campaigns])
+        for campaign in campaigns:
+            if campaign.recipient_filter and campaign.recipient_filter['column'] not in header:
+                logger.error("Error: %s has no '%s' column for the filter of campaign '%s'",
+                             csv_file, campaign.recipient_filter['column'], campaign.name)
+                complete = False
+        return complete
+    
+    loaded = load_run_recipients(args, validator, batch_columns(campaigns), check)
+    if loaded is None:
+        return
+    recipients, recipient_count = loaded
+    names = ", ".join(campaign.name for campaign in campaigns)
+    
+    skip = None
+    jobs = None
+    if test_mode:
+        logger.info("[TEST MODE] Generating sample emails of %d campaigns (%s) without sending...", len(campaigns), names)
+        logger.info("=" * 60)
+        
+        if args.sample or args.summary_only or args.preview_dir or args.preview_archive:
+            # These preview the campaigns one after the other, so the list is gone through once per campaign
+            recipients = list(recipients)
+            
+            def campaign_members(campaign):
+                members = (recipient for recipient in recipients if campaign.includes(recipient))
+                if args.sample:
+                    members = sample_recipients(members, args.sample, args.sample_size, templates=campaign.templates)
+                return members
+            
+            if args.summary_only:
+                for campaign in campaigns:
+                    print(f"[CAMPAIGN] {campaign.name}")
+                    print_condition_summary(*condition_summary(campaign_members(campaign), campaign.templates),
+                                            templates=campaign.templates)
+                return
+            
+            if args.preview_dir or args.preview_archive:
+                for campaign in campaigns:
+                    writer = campaign_writer(campaign.name, args.preview_dir, args.preview_archive)
+                    count = write_previews(campaign_members(campaign), writer, campaign.templates)
+                    logger.info("[TEST SUMMARY] Wrote previews of %d emails of campaign %s to %s",
+                                count, campaign.name, writer.path)
+                return
+            
+            jobs = (CampaignRecipient(campaign, recipient)
+                    for campaign in campaigns for recipient in campaign_members(campaign))
+    else:
+        if not confirm_send():
+            return
+        
+        from delivery_journal import DeliveryJournal, campaign_hash
+        
+        session = open_send_session(workers)
+        if session is None:
+            return
+        sender_email, smtp_pool, skeleton, scheduler = session
+        
+        # Each campaign has its own journal entries, so one of them can be resumed without the others
+        for campaign in campaigns:
+            campaign_id = f"{campaign.name}-{campaign_hash(campaign.config_file, csv_file)}"
+            campaign.journal = DeliveryJournal(DELIVERY_JOURNAL_FILE, campaign_id)
+            if campaign.journal.delivered:
+                if args.resume:
+                    logger.info("[RESUME] Skipping %d recipients who already received campaign %s",
+                                len(campaign.journal.delivered), campaign_id)
+                else:
+                    logger.warning("[WARNING] %d recipients already received campaign %s",
+                                   len(campaign.journal.delivered), campaign_id)
+                    logger.warning("          Run with --resume to skip them")
+        if args.resume:
+            skip = lambda campaign, recipient: campaign.journal.is_delivered(recipient['Mail'])
+        
+        logger.info("\n[SEND MODE] Starting to send %d campaigns (%s) to %s recipients...",
+                    len(campaigns), names, recipient_count)
+        logger.info("=" * 50)
+    
+    def process_recipient(job):
+        if test_mode:
+            result = process_personalized_email(job, test_mode=True, templates=job.campaign.templates)
+        else:
+            result = process_personalized_email(
+                job, test_mode=False,
+                sender_email=sender_email, smtp_pool=smtp_pool,
+                journal=job.campaign.journal, scheduler=scheduler, skeleton=skeleton,
+                templates=job.campaign.templates
+            )
+        if result[0] is not None:
+            job.campaign.summary.record(job['Name'], *result)
+        logger.info("")  # Empty line for readability
+        return result
+    
+    # The emails of all campaigns go through the same workers, recipient by recipient
+    reporter = MetricsReporter(METRICS, args.metrics_interval) if args.metrics_interval > 0 else nullcontext()
+    try:
+        with reporter:
+            if jobs is None:
+                jobs = campaign_recipients(recipients, campaigns, skip)
+            run_sends(
+                jobs, process_recipient,
+                workers=workers, per_domain_limit=args.per_domain,
+                scheduler=None if test_mode else scheduler
+            )
+    finally:
+        if not test_mode:
+            smtp_pool.close()
+    
+    print("=" * 50)
+    print(f"[BATCH SUMMARY] {len(campaigns)} campaigns {'previewed' if test_mode else 'sent'}")
+    total = 0
+    for campaign in campaigns:
+        if test_mode:
+            successful_sends = campaign.summary.successful_sends
+            failed_sends = campaign.summary.failed_sends
+            failed_recipients = campaign.summary.failed_recipients
+        else:
+            # The journal knows about earlier, interrupted runs of this campaign as well
+            successful_sends, failed_sends, failed_recipients = campaign.journal.summary()
+            campaign.journal.close()
+        logger.debug("[SUMMARY] %s: %d successful, %d failed", campaign.name, successful_sends, failed_sends,
+                     event="summary", campaign=campaign.name, successful=successful_sends,
+                     failed=failed_sends, failed_recipients=failed_recipients)
+        print(f"[{campaign.name}] Successful: {successful_sends}, Failed: {failed_sends}")
+        total += successful_sends + failed_sends
+        for name, error in failed_recipients:
+            print(f"  - {name}: {error}")
+    print(f"[TOTAL] Total: {total}")
+    if validator.rejected:
+        print(f"[REJECTED] Invalid or duplicate addresses: {validator.rejected}")
+    if not test_mode:
+        print(f"[CACHE] Rendered emails reused: {sum(campaign.templates.render_cache.hits for campaign in campaigns)}, "
+              f"rendered: {sum(campaign.templates.render_cache.misses for campaign in campaigns)}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,27 @@
+def message_subject(name):
+    """Subject line of the email for a recipient"""
+    return f"Personal message for {name}"
+
+
+def build_message(sender_email, email, name, plain_text, html_text):
+    """Create the multipart email with a plain text and an HTML alternative"""
+    # The email package is only needed for previews and unusual headers - the send path uses MessageSkeleton
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
+    message = MIMEMultipart("alternative")
+    message["Subject"] = message_subject(name)
+    message["From"] = sender_email
+    message["To"] = email
+
+    # Attach plain text and HTML parts
+    part1 = MIMEText(plain_text, "plain", "utf-8")
+    part2 = MIMEText(html_text, "html", "utf-8")
+    message.attach(part1)
+    message.attach(part2)
+    return message
+
+
+def message_bytes(message):
+    """Serialize a MIME message into the CRLF-terminated bytes that go over the wire"""
+    return message.as_string(policy=message.policy.clone(linesep='\r\n')).encode('ascii')
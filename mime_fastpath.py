@@ -0,0 +1,77 @@
+import secrets
+from base64 import encodebytes
+
+from mime_build import message_subject, build_message, message_bytes
+
+CRLF = b'\r\n'
+
+
+def _is_plain_header_value(value):
+    # Only plain ASCII single-line values can be written as-is, everything else goes through the email package
+    return value.isascii() and '\r' not in value and '\n' not in value
+
+
+def _body_part(boundary, subtype):
+    return (
+        b'--' + boundary + CRLF
+        + b'Content-Type: text/' + subtype + b'; charset="utf-8"' + CRLF
+        + b'MIME-Version: 1.0' + CRLF
+        + b'Content-Transfer-Encoding: base64' + CRLF
+        + CRLF
+    )
+
+
+# Class for assembling the wire bytes of a campaign's emails without the email package.
+# Everything that is the same for every recipient (structure, part headers, boundary, sender)
+# is encoded once; per recipient only the To/Subject headers and the two bodies are added.
+# The result has exactly the layout build_message() + as_string() produce, with CRLF line endings.
+class MessageSkeleton:
+    def __init__(self, sender_email):
+        self.sender_email = sender_email
+        self.fast = _is_plain_header_value(sender_email)
+        # Same form as the boundaries of the email package. Base64 bodies can never contain a run
+        # of '=' this long, so one boundary is safe for the whole campaign.
+        boundary = ('=' * 15 + f"{secrets.randbelow(10 ** 19):019d}" + '==').encode('ascii')
+        self.head = (
+            b'Content-Type: multipart/alternative; boundary="' + boundary + b'"' + CRLF
+            + b'MIME-Version: 1.0' + CRLF
+        )
+        self.from_line = b'From: ' + sender_email.encode('ascii') + CRLF if self.fast else b''
+        self.plain_part = CRLF + _body_part(boundary, b'plain')
+        self.html_part = CRLF + _body_part(boundary, b'html')
+        self.closing = CRLF + b'--' + boundary + b'--' + CRLF
+
+    @staticmethod
+    def _encode_body(text):
+        # 76 character base64 lines, like the utf-8 charset of the email package
+        return encodebytes(text.encode('utf-8')).replace(b'\n', CRLF)
+
+    def encode_bodies(self, plain_text, html_text):
+        """Encode the two bodies of a message - the result can be reused for identical bodies"""
+        return self._encode_body(plain_text), self._encode_body(html_text)
+
+    def render_cached(self, email, name, rendered):
+        """Like render() for a RenderedEmail, whose encoded bodies are kept for the next recipient sharing it"""
+        if rendered.encoded_bodies is None:
+            rendered.encoded_bodies = self.encode_bodies(rendered.plain_text, rendered.html_text)
+        return self.render(email, name, rendered.plain_text, rendered.html_text, rendered.encoded_bodies)
+
+    def render(self, email, name, plain_text, html_text, encoded_bodies=None):
+        """Return the complete message for one recipient as bytes ready for sendmail"""
+        email = str(email)
+        subject = message_subject(name)
+        if not (self.fast and _is_plain_header_value(email) and _is_plain_header_value(subject)):
+            return message_bytes(build_message(self.sender_email, email, name, plain_text, html_text))
+        if encoded_bodies is None:
+            encoded_bodies = self.encode_bodies(plain_text, html_text)
+        return b''.join((
+            self.head,
+            b'Subject: ', subject.encode('ascii'), CRLF,
+            self.from_line,
+            b'To: ', email.encode('ascii'), CRLF,
+            self.plain_part,
+            encoded_bodies[0],
+            self.html_part,
+            encoded_bodies[1],
+            self.closing,
+        ))
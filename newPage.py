@@ -1,18 +1,154 @@
-from bs4 import BeautifulSoup  
 from email_config import (
     CONDITIONAL_CONTENT, 
     DEFAULT_EMAIL_BODY_TEMPLATE, 
     FALLBACK_EMAIL_BODY_TEMPLATE,
     DEFAULT_CLOSING,
-    SHOW_MISSING_COLUMN_WARNINGS
+    SHOW_MISSING_COLUMN_WARNINGS,
+    USE_BEAUTIFULSOUP_FOR_PLAIN_TEXT,
+    RENDER_CACHE_SIZE
 )
+from html_to_text import html_to_text
+from template_compiler import compile_template
+from condition_matcher import ConditionMatcher
+from render_cache import RenderCache, RenderedEmail
+from instrumentation import logger, METRICS
+
+# BeautifulSoup is optional - it is only used when explicitly enabled in email_config.py
+BeautifulSoup = None
+if USE_BEAUTIFULSOUP_FOR_PLAIN_TEXT:
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        logger.warning("[WARNING] beautifulsoup4 is not installed - using the built-in plain text conversion")
+
+# Class bundling the templates and conditions of one configuration - email_config.py or the
+# module of one campaign in a batch run - with everything compiled from them: the condition
+# lookup tables and a render cache keyed by exactly the columns these templates read.
+class TemplateSet:
+    def __init__(self, conditional_content, body_template, fallback_body_template, closing,
+                 name=None, render_cache_size=RENDER_CACHE_SIZE):
+        self.name = name
+        self.conditional_content = conditional_content
+        self.body_template = body_template
+        self.fallback_body_template = fallback_body_template
+        self.closing = closing
+        # All conditions compiled once into per-column lookup tables
+        self.matcher = ConditionMatcher(conditional_content)
+        # Compile all templates once so every recipient reuses the same render plans
+        for _, template in self.templates():
+            compile_template(template)
+        # Recipients whose referenced columns are identical get the very same email body
+        self.render_cache = RenderCache(self.referenced_columns(), maxsize=render_cache_size)
+
+    @classmethod
+    def from_module(cls, module, name=None):
+        """TemplateSet of a configuration module; settings it does not define are taken from email_config.py"""
+        return cls(
+            getattr(module, 'CONDITIONAL_CONTENT', CONDITIONAL_CONTENT),
+            getattr(module, 'DEFAULT_EMAIL_BODY_TEMPLATE', DEFAULT_EMAIL_BODY_TEMPLATE),
+            getattr(module, 'FALLBACK_EMAIL_BODY_TEMPLATE', FALLBACK_EMAIL_BODY_TEMPLATE),
+            getattr(module, 'DEFAULT_CLOSING', DEFAULT_CLOSING),
+            name=name,
+            render_cache_size=getattr(module, 'RENDER_CACHE_SIZE', RENDER_CACHE_SIZE)
+        )
+
+    def templates(self):
+        """(where, template) for every template that is filled in with recipient data"""
+        templates = [
+            ("DEFAULT_EMAIL_BODY_TEMPLATE", self.body_template),
+            ("FALLBACK_EMAIL_BODY_TEMPLATE", self.fallback_body_template),
+            ("DEFAULT_CLOSING", self.closing)
+        ]
+        templates += [(f"condition '{condition['name']}'", condition['content'])
+                      for condition in self.conditional_content if condition.get('is_template', False)]
+        return templates
+
+    def column_references(self):
+        """
+        Map every CSV column the templates and conditions read to the places using it,
+        e.g. {'Nickname': ["DEFAULT_EMAIL_BODY_TEMPLATE", "condition 'birthday_greeting'"]}.
+        Returns None if a template uses constructs whose columns cannot be determined up front.
+        """
+        references = {}
+        for condition in self.conditional_content:
+            references.setdefault(condition['column'], []).append(f"condition '{condition['name']}'")
+        for where, template in self.templates():
+            template_columns = compile_template(template).columns
+            if template_columns is None:
+                return None
+            for column in sorted(template_columns):
+                users = references.setdefault(column, [])
+                if where not in users:
+                    users.append(where)
+        return references
+
+    def referenced_columns(self):
+        """
+        Return the set of CSV columns the templates and conditions read,
+        or None if a template uses constructs whose columns cannot be determined up front.
+        """
+        references = self.column_references()
+        return None if references is None else set(references)
+
+# The templates and conditions of email_config.py, used unless a batch run selects others
+DEFAULT_TEMPLATES = TemplateSet(CONDITIONAL_CONTENT, DEFAULT_EMAIL_BODY_TEMPLATE,
+                                FALLBACK_EMAIL_BODY_TEMPLATE, DEFAULT_CLOSING)
+CONDITION_MATCHER = DEFAULT_TEMPLATES.matcher
+RENDER_CACHE = DEFAULT_TEMPLATES.render_cache
+
+def column_references():
+    """TemplateSet.column_references() of email_config.py"""
+    return DEFAULT_TEMPLATES.column_references()
+
+def referenced_columns():
+    """TemplateSet.referenced_columns() of email_config.py"""
+    return DEFAULT_TEMPLATES.referenced_columns()
+
+def print_missing_column_warnings(recipient_data, templates=None):
+    templates = templates or DEFAULT_TEMPLATES
+    for index in templates.matcher.missing_conditions(recipient_data):
+        condition = templates.conditional_content[index]
+        logger.warning("  [WARNING] Column '%s' not found for condition '%s'", condition['column'], condition['name'])
+
+def render_email(recipient_name, recipient_data, templates=None):
+    """
+    Render the email for a recipient and return a RenderedEmail.
+    templates is the TemplateSet to render with, email_config.py by default.
+    Identical renderings are served from its render cache instead of being built again.
+    """
+    templates = templates or DEFAULT_TEMPLATES
+    render_cache = templates.render_cache
+    key = render_cache.key(recipient_name, recipient_data)
+    if key is not None:
+        rendered = render_cache.get(key)
+        if rendered is not None:
+            # Report the same status lines as a fresh rendering
+            if SHOW_MISSING_COLUMN_WARNINGS:
+                print_missing_column_warnings(recipient_data, templates)
+            for condition_name in rendered.applied_conditions:
+                logger.info("  [APPLIED] Condition '%s' activated", condition_name)
+            return rendered
+    
+    with METRICS.timer("template_render"):
+        page = newPage(recipient_name=recipient_name, recipient_data=recipient_data, templates=templates)
+    with METRICS.timer("condition_eval"):
+        applied_conditions = page.processConditionalContent()
+    with METRICS.timer("html_to_text"):
+        plain_text, html_text = page.returnPage()
+    rendered = RenderedEmail(applied_conditions, plain_text, html_text)
+    if key is not None:
+        render_cache.put(key, rendered)
+    return rendered
 
 # Class for creating a new email page in html format built from different parts
 # the final page can then be returned as html and plain text
+# recipient_data can be any mapping of column name to value (dict, RecipientRecord, pandas Series)
 class newPage:
-    def __init__(self, recipient_name="", recipient_data=None):
+    def __init__(self, recipient_name="", recipient_data=None, templates=None):
         self.recipient_name = recipient_name
         self.recipient_data = recipient_data or {}
+        # TemplateSet to build the email from, email_config.py by default
+        self.templates = templates or DEFAULT_TEMPLATES
         self.text = self.defaultText()
         self.conditional_content = ""
         self.greetings = self.defaultGreetings()
@@ -21,64 +157,21 @@ class newPage:
     def defaultText(self):
         # Default text for the new email using configuration with full recipient data access
         if self.recipient_name:
-            return self.format_template(DEFAULT_EMAIL_BODY_TEMPLATE, self.recipient_data)
+            return self.format_template(self.templates.body_template, self.recipient_data)
         else:
-            return self.format_template(FALLBACK_EMAIL_BODY_TEMPLATE, self.recipient_data)
+            return self.format_template(self.templates.fallback_body_template, self.recipient_data)
     
     def defaultGreetings(self):
         # Default greetings using configuration with full recipient data access
-        return self.format_template(DEFAULT_CLOSING, self.recipient_data)
+        return self.format_template(self.templates.closing, self.recipient_data)
     
     def format_template(self, template, recipient_data):
         """
         Format a template with recipient data, supporting fallback syntax.
         Supports {ColumnName|fallback_text} syntax for graceful fallbacks.
+        Templates are compiled once and cached, so each call is a single pass over the template.
         """
-        result = template
-        max_iterations = 5  # Prevent infinite loops
-        
-        for iteration in range(max_iterations):
-            # Find all simple placeholders first: {ColumnName}
-            import re
-            
-            def replace_simple_placeholder(match):
-                column_name = match.group(1).strip()
-                if column_name in recipient_data:
-                    value = str(recipient_data[column_name]).strip()
-                    if value and value.lower() not in ['nan', 'none', 'false', '']:
-                        return value
-                return ""
-            
-            # First pass: replace all simple placeholders
-            prev_result = result
-            result = re.sub(r'\{([^|{}]+)\}', replace_simple_placeholder, result)
-            
-            # Second pass: handle fallback placeholders
-            def replace_fallback_placeholder(match):
-                content = match.group(1)
-                if '|' in content:
-                    parts = content.split('|', 1)
-                    column_name = parts[0].strip()
-                    fallback = parts[1].strip()
-                    
-                    # Check if the column exists and has a non-empty value
-                    if column_name in recipient_data:
-                        value = str(recipient_data[column_name]).strip()
-                        if value and value.lower() not in ['nan', 'none', 'false', '']:
-                            return value
-                    
-                    # Use fallback
-                    return fallback
-                
-                return match.group(0)  # Return unchanged if no fallback
-            
-            result = re.sub(r'\{([^{}]+\|[^{}]+)\}', replace_fallback_placeholder, result)
-            
-            # If no changes were made, we're done
-            if result == prev_result:
-                break
-        
-        return result
+        return compile_template(template).render(recipient_data)
     
     def processConditionalContent(self):
         """
@@ -87,41 +180,23 @@ class newPage:
         """
         applied_conditions = []
         
-        for condition in CONDITIONAL_CONTENT:
+        if SHOW_MISSING_COLUMN_WARNINGS:
+            print_missing_column_warnings(self.recipient_data, self.templates)
+        
+        for index in self.templates.matcher.match(self.recipient_data):
+            condition = self.templates.conditional_content[index]
             condition_name = condition['name']
-            column_name = condition['column']
-            trigger_values = [str(v).upper() for v in condition['trigger_values']]
             content = condition['content']
-            is_template = condition.get('is_template', False)
-            template_key = condition.get('template_key', '')
             
-            # Check if the required column exists in recipient data
-            if column_name not in self.recipient_data:
-                if SHOW_MISSING_COLUMN_WARNINGS:
-                    print(f"  [WARNING] Column '{column_name}' not found for condition '{condition_name}'")
-                continue
-            
-            # Get the value and check if it matches any trigger values
-            recipient_value = str(self.recipient_data[column_name]).strip()
-            recipient_value_upper = recipient_value.upper()
-            
-            # Handle special '*' trigger that matches any non-empty value
-            should_apply = False
-            if '*' in trigger_values:
-                should_apply = recipient_value and recipient_value != 'nan' and recipient_value.strip()
+            # Handle template conditions with full recipient data access
+            if condition.get('is_template', False):
+                final_content = self.format_template(content, self.recipient_data)
             else:
-                should_apply = recipient_value_upper in trigger_values
+                final_content = content
             
-            if should_apply:
-                # Handle template conditions with full recipient data access
-                if is_template:
-                    final_content = self.format_template(content, self.recipient_data)
-                else:
-                    final_content = content
-                
-                self.conditional_content += final_content
-                applied_conditions.append(condition_name)
-                print(f"  [APPLIED] Condition '{condition_name}' activated")
+            self.conditional_content += final_content
+            applied_conditions.append(condition_name)
+            logger.info("  [APPLIED] Condition '%s' activated", condition_name)
         
         return applied_conditions
     
@@ -143,9 +218,12 @@ class newPage:
           </body>
         </html>
         """
-        # Parse HTML with explicit UTF-8 encoding and better text extraction
-        soup = BeautifulSoup(htmlText, 'html.parser')
-        plainText = soup.get_text(separator='\n', strip=True)
+        # Plain text alternative: one line per text fragment of the HTML
+        if BeautifulSoup is not None:
+            soup = BeautifulSoup(htmlText, 'html.parser')
+            plainText = soup.get_text(separator='\n', strip=True)
+        else:
+            plainText = html_to_text(htmlText)
         return plainText, htmlText
     
     def saveHTML(self, filename="email.html"):
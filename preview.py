@@ -0,0 +1,196 @@
+import io
+import os
+import re
+import csv
+import random
+import itertools
+from collections import Counter
+from contextlib import redirect_stdout
+
+from newPage import render_email, DEFAULT_TEMPLATES
+from recipient_record import iter_records
+
+SAMPLE_MODES = ('first', 'random', 'combinations')
+
+
+def condition_combination(recipient, templates=None):
+    """Names of the conditions that apply to a recipient, in configuration order"""
+    templates = templates or DEFAULT_TEMPLATES
+    return tuple(templates.conditional_content[index]['name'] for index in templates.matcher.match(recipient))
+
+
+def _is_frame(recipients):
+    # Checked without importing pandas - small CSV files are previewed without it
+    return hasattr(recipients, 'itertuples')
+
+
+def _frame_combinations(recipients_df, templates):
+    """
+    (first row, number of rows, condition names) of every distinct combination of applied conditions
+    in a recipient DataFrame, in the order they first appear - all from one condition mask
+    """
+    import numpy as np
+
+    mask = templates.matcher.condition_mask(recipients_df).to_numpy()
+    if not mask.shape[1]:
+        # No conditions: every recipient has the same, empty combination
+        return [(0, len(mask), ())] if len(mask) else []
+    # Each row packed into a few bytes is much faster to compare than a row of booleans
+    packed = np.packbits(mask, axis=1)
+    rows = packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+    _, first, counts = np.unique(rows, return_index=True, return_counts=True)
+    names = [condition['name'] for condition in templates.conditional_content]
+    return [(int(first[row]), int(counts[row]), tuple(names[index] for index in np.flatnonzero(mask[first[row]])))
+            for row in np.argsort(first)]
+
+
+def sample_recipients(recipients, mode, size=10, seed=None, templates=None):
+    """
+    Pick the recipients to preview:
+    'first' - the first `size` recipients
+    'random' - `size` random recipients (reservoir sampling, the list is read only once)
+    'combinations' - the first recipient of every distinct combination of applied conditions
+    recipients are records or a DataFrame, whose combinations are found with one condition mask.
+    templates is the TemplateSet whose conditions are combined, email_config.py by default.
+    """
+    if _is_frame(recipients):
+        if mode == 'combinations':
+            first_rows = [first for first, _, _ in _frame_combinations(recipients, templates or DEFAULT_TEMPLATES)]
+            return iter_records(recipients.iloc[first_rows])
+        recipients = iter_records(recipients)
+    if mode == 'first':
+        return itertools.islice(recipients, size)
+    if mode == 'random':
+        rng = random.Random(seed)
+        reservoir = []
+        for seen, recipient in enumerate(recipients):
+            if seen < size:
+                reservoir.append(recipient)
+            else:
+                slot = rng.randint(0, seen)
+                if slot < size:
+                    reservoir[slot] = recipient
+        return iter(reservoir)
+    if mode == 'combinations':
+        return _first_per_combination(recipients, templates)
+    raise ValueError(f"Unknown sample mode '{mode}', use one of {', '.join(SAMPLE_MODES)}")
+
+
+def _first_per_combination(recipients, templates):
+    # Keyed by condition index - conditions may share a name
+    matcher = (templates or DEFAULT_TEMPLATES).matcher
+    seen = set()
+    for recipient in recipients:
+        combination = tuple(matcher.match(recipient))
+        if combination not in seen:
+            seen.add(combination)
+            yield recipient
+
+
+def condition_summary(recipients, templates=None):
+    """
+    Count recipients per applied condition and per combination of conditions without rendering any email.
+    recipients are records or a DataFrame, which is evaluated with one condition mask.
+    """
+    per_condition = Counter()
+    per_combination = Counter()
+    if _is_frame(recipients):
+        for _, count, combination in _frame_combinations(recipients, templates or DEFAULT_TEMPLATES):
+            per_combination[combination] += count
+            for name in combination:
+                per_condition[name] += count
+        return len(recipients), per_condition, per_combination
+    total = 0
+    for recipient in recipients:
+        combination = condition_combination(recipient, templates)
+        per_condition.update(combination)
+        per_combination[combination] += 1
+        total += 1
+    return total, per_condition, per_combination
+
+
+def print_condition_summary(total, per_condition, per_combination, templates=None):
+    templates = templates or DEFAULT_TEMPLATES
+    print(f"[SUMMARY] {total} recipients")
+    print("[CONDITIONS] Recipients per applied condition:")
+    for condition in templates.conditional_content:
+        print(f"  - {condition['name']}: {per_condition.get(condition['name'], 0)}")
+    print(f"[COMBINATIONS] {len(per_combination)} distinct combinations of conditions:")
+    for combination, count in per_combination.most_common():
+        print(f"  - {', '.join(combination) or '(none)'}: {count}")
+
+
+def _file_stem(number, email):
+    return f"{number:06d}_{re.sub(r'[^A-Za-z0-9@._-]', '_', str(email))}"
+
+
+class DirectoryWriter:
+    """Writes preview files into a directory"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, filename, text):
+        with open(os.path.join(self.path, filename), "w", encoding="utf-8", buffering=1 << 16) as file:
+            file.write(text)
+
+    def close(self):
+        pass
+
+
+class ArchiveWriter:
+    """Writes preview files into a single compressed zip archive"""
+
+    def __init__(self, path):
+        # zipfile takes a while to import and is only needed for --preview-archive
+        import zipfile
+
+        self.path = path
+        self.archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, filename, text):
+        self.archive.writestr(filename, text.encode("utf-8"))
+
+    def close(self):
+        self.archive.close()
+
+
+def campaign_writer(campaign_name, preview_dir=None, preview_archive=None):
+    """
+    Writer for the previews of one campaign of a batch run: a subdirectory of preview_dir named
+    after the campaign, or an archive named like preview_archive with the campaign name appended
+    """
+    name = re.sub(r'[^A-Za-z0-9._-]', '_', campaign_name)
+    if preview_archive:
+        root, extension = os.path.splitext(preview_archive)
+        return ArchiveWriter(f"{root}_{name}{extension or '.zip'}")
+    return DirectoryWriter(os.path.join(preview_dir, name))
+
+
+def write_previews(recipients, writer, templates=None):
+    """
+    Render every recipient and write its HTML and plain text version through writer,
+    plus an index.csv listing recipients, applied conditions and file names.
+    templates is the TemplateSet to render with, email_config.py by default.
+    Returns the number of recipients written.
+    """
+    index = io.StringIO()
+    index_writer = csv.writer(index)
+    index_writer.writerow(["Name", "Mail", "Conditions", "HTML", "Text"])
+    count = 0
+    # The per-recipient status lines are what floods the terminal - keep them out
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        try:
+            for count, recipient in enumerate(recipients, start=1):
+                name = recipient['Name']
+                rendered = render_email(name, recipient, templates)
+                stem = _file_stem(count, recipient['Mail'])
+                writer.write(stem + ".html", rendered.html_text)
+                writer.write(stem + ".txt", rendered.plain_text)
+                index_writer.writerow([name, recipient['Mail'], " ".join(rendered.applied_conditions),
+                                       stem + ".html", stem + ".txt"])
+            writer.write("index.csv", index.getvalue())
+        finally:
+            writer.close()
+    return count
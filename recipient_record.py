@@ -0,0 +1,44 @@
+from collections.abc import Mapping
+
+
+class RecipientRecord(Mapping):
+    """
+    One recipient as a lightweight read-only mapping keyed by the CSV header.
+    All records of a file share the same column -> position dictionary, so a record
+    only holds a reference to it and a tuple of values.
+    """
+    __slots__ = ('_columns', '_values')
+
+    def __init__(self, columns, values):
+        self._columns = columns
+        self._values = values
+
+    def __getitem__(self, column):
+        return self._values[self._columns[column]]
+
+    def __contains__(self, column):
+        return column in self._columns
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def get(self, column, default=None):
+        position = self._columns.get(column)
+        return default if position is None else self._values[position]
+
+    def as_tuple(self):
+        """The values of the record in column order"""
+        return self._values
+
+    def __repr__(self):
+        return f"RecipientRecord({dict(zip(self._columns, self._values))!r})"
+
+
+def iter_records(df):
+    """Yield a RecipientRecord for every row of a recipient DataFrame without building a Series per row"""
+    columns = {name: position for position, name in enumerate(df.columns)}
+    for values in df.itertuples(index=False, name=None):
+        yield RecipientRecord(columns, values)
@@ -0,0 +1,222 @@
+import re
+import csv
+import socket
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import logger
+
+# Pragmatic address syntax: at most 254 characters, a dot-atom local part of at most 64 characters
+# and a domain of letters, digits and hyphens with a top level domain of at least two letters.
+# Quoted local parts and IP literals are rejected.
+EMAIL_PATTERN = (
+    r"(?=.{1,254}$)(?=[^@]{1,64}@)"
+    r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}"
+)
+
+_EMAIL = re.compile(EMAIL_PATTERN)
+
+MISSING = "missing address"
+INVALID = "invalid address syntax"
+DUPLICATE = "duplicate of line {line}"
+NO_MAIL_SERVER = "no mail server for {domain}"
+
+# Number of domains looked up in parallel
+MX_LOOKUP_THREADS = 16
+
+
+REJECT_COLUMNS = ['Line', 'Name', 'Mail', 'Reason']
+
+
+@lru_cache(maxsize=None)
+def _dns_resolver():
+    # dnspython is optional - without it a domain only has to resolve to an address.
+    # It is imported on the first lookup only, as it takes longer to load than most runs spend on DNS.
+    try:
+        import dns.resolver
+    except ImportError:
+        return None
+    return dns
+
+
+def resolve_mx(domain):
+    """
+    Return the mail servers of a domain - its MX hosts, or the domain itself if it has
+    an address but no MX record. An empty list means mail to the domain cannot be delivered.
+    Errors other than "does not exist" (timeouts, unreachable DNS) are raised.
+    """
+    dns = _dns_resolver()
+    if dns is not None:
+        try:
+            answer = dns.resolver.resolve(domain, 'MX')
+            # A single "." MX (RFC 7505) means the domain does not accept mail
+            return [str(record.exchange).rstrip('.') for record in answer if str(record.exchange) != '.']
+        except dns.resolver.NXDOMAIN:
+            return []
+        except dns.resolver.NoAnswer:
+            pass
+    try:
+        socket.getaddrinfo(domain, 25, proto=socket.IPPROTO_TCP)
+        return [domain]
+    except socket.gaierror as e:
+        if e.errno in (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)):
+            return []
+        raise
+
+
+class StaticResolver:
+    """Resolver with fixed answers instead of DNS, for tests and offline runs: {domain: [mail servers]}"""
+
+    def __init__(self, records):
+        self.records = {domain.lower(): list(hosts) for domain, hosts in records.items()}
+        self.lookups = []
+
+    def __call__(self, domain):
+        self.lookups.append(domain)
+        return self.records.get(domain, [])
+
+
+# Class checking the Mail column of recipient DataFrames before anything is rendered.
+# Addresses are normalized, syntax-checked and deduplicated for the whole DataFrame at once;
+# with check_mx every domain is additionally looked up once. Duplicates are also found across
+# several DataFrames, so the chunks of a streamed CSV file can be validated one by one.
+class RecipientValidator:
+    def __init__(self, check_mx=False, resolver=None):
+        self.check_mx = check_mx
+        self.resolver = resolver or resolve_mx
+        # Normalized address -> CSV line of its first occurrence
+        self.seen = {}
+        # Domain -> whether it accepts mail (None if the lookup failed)
+        self.domains = {}
+        # (line, name, mail, reason) of every rejected recipient so far
+        self.rejects = []
+
+    def validate(self, df):
+        """
+        Split a recipient DataFrame into (valid, rejects).
+        valid keeps the accepted rows with their Mail values stripped; rejects is a list of
+        (CSV line, Name, Mail, reason) tuples, one per rejected recipient.
+        """
+        import numpy as np
+        import pandas as pd
+
+        mail = df['Mail'].astype(str).str.strip()
+        key = mail.str.lower()
+        # Line in the CSV file: the header is line 1 and the index counts rows across chunks
+        lines = pd.Series(np.asarray(df.index) + 2, index=df.index)
+
+        missing = (mail == '') | key.isin(['nan', 'none'])
+        invalid = ~missing & ~mail.str.fullmatch(EMAIL_PATTERN)
+        candidate = ~missing & ~invalid
+
+        # Repeated addresses, within this DataFrame or since an earlier one
+        duplicate = candidate & key.duplicated()
+        if self.seen:
+            seen = self.seen
+            duplicate |= candidate & np.fromiter((address in seen for address in key), bool, len(key))
+        first_line = {}
+        if duplicate.any():
+            # Line of the first occurrence of every repeated address, for the report
+            first_line = dict(zip(key[candidate & ~duplicate], lines[candidate & ~duplicate]))
+
+        reasons = pd.Series(
+            np.select([missing, invalid], [MISSING, INVALID], default=''),
+            index=df.index, dtype=object
+        )
+        reasons[duplicate] = [DUPLICATE.format(line=first_line.get(address) or self.seen[address]) for address in key[duplicate]]
+
+        accepted = candidate & ~duplicate
+        # An empty selection would have no domain column to look up
+        if self.check_mx and accepted.any():
+            domain = key[accepted].str.rpartition('@')[2]
+            self._resolve(domain.unique())
+            # Only domains known to have no mail server are rejected, failed lookups are not
+            no_mail_server = {name: accepts_mail is False for name, accepts_mail in self.domains.items()}
+            undeliverable = domain.index[domain.map(no_mail_server)]
+            reasons[undeliverable] = [NO_MAIL_SERVER.format(domain=name) for name in domain[undeliverable]]
+            accepted[undeliverable] = False
+
+        self.seen.update(zip(key[accepted], lines[accepted]))
+
+        valid = df[accepted].copy()
+        valid['Mail'] = mail[accepted]
+        rejected = ~accepted
+        names = df['Name'][rejected] if 'Name' in df.columns else [''] * int(rejected.sum())
+        rejects = list(zip(lines[rejected].tolist(), names, mail[rejected], reasons[rejected]))
+        self.rejects += rejects
+        return valid, rejects
+
+    def validate_records(self, records, first_line=2):
+        """
+        validate() for a list of recipient records, e.g. from csv_records.read_csv_records(),
+        checked one by one - for small lists this is faster than building a DataFrame.
+        The Mail values are expected to be stripped already. Returns (valid records, rejects).
+        """
+        candidates = []
+        rejects = []
+        for line, record in enumerate(records, first_line):
+            mail = str(record.get('Mail', '')).strip()
+            key = mail.lower()
+            if not mail or key in ('nan', 'none'):
+                rejects.append((line, record.get('Name', ''), mail, MISSING))
+            elif not _EMAIL.fullmatch(mail):
+                rejects.append((line, record.get('Name', ''), mail, INVALID))
+            elif key in self.seen:
+                rejects.append((line, record.get('Name', ''), mail, DUPLICATE.format(line=self.seen[key])))
+            else:
+                self.seen[key] = line
+                candidates.append((line, key, record))
+
+        valid = []
+        if self.check_mx:
+            self._resolve({key.rpartition('@')[2] for _, key, _ in candidates})
+        for line, key, record in candidates:
+            domain = key.rpartition('@')[2]
+            if self.check_mx and self.domains.get(domain) is False:
+                del self.seen[key]
+                rejects.append((line, record.get('Name', ''), record['Mail'], NO_MAIL_SERVER.format(domain=domain)))
+            else:
+                valid.append(record)
+        rejects.sort(key=lambda reject: reject[0])
+        self.rejects += rejects
+        return valid, rejects
+
+    @property
+    def rejected(self):
+        return len(self.rejects)
+
+    def write_rejects(self, path):
+        """Write all rejected recipients into a CSV file"""
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(REJECT_COLUMNS)
+            writer.writerows(self.rejects)
+
+    def _resolve(self, domains):
+        """Look every domain that was not seen before up once, in parallel"""
+        new_domains = [domain for domain in domains if domain not in self.domains]
+        if not new_domains:
+            return
+
+        def lookup(domain):
+            try:
+                return bool(self.resolver(domain))
+            except Exception as e:
+                logger.warning("  [WARNING] Could not look up the mail servers of %s: %s", domain, e)
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(MX_LOOKUP_THREADS, len(new_domains))) as executor:
+            for domain, accepts_mail in zip(new_domains, executor.map(lookup, new_domains)):
+                self.domains[domain] = accepts_mail
+
+
+def report_rejects(rejects):
+    """Log every rejected recipient"""
+    if not rejects:
+        return
+    logger.warning("[PREFLIGHT] %d recipients rejected before sending:", len(rejects),
+                   event="rejected", count=len(rejects))
+    for line, name, mail, reason in rejects:
+        logger.warning("  - line %d: %s <%s>: %s", line, name, mail, reason,
+                       event="reject", line=line, recipient=mail, reason=reason)
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+# Key entry for a column the recipient data does not have
+_MISSING = object()
+
+
+class RenderedEmail:
+    """The rendered content of one email, shared by all recipients with the same relevant data"""
+    __slots__ = ('applied_conditions', 'plain_text', 'html_text', 'encoded_bodies')
+
+    def __init__(self, applied_conditions, plain_text, html_text):
+        self.applied_conditions = applied_conditions
+        self.plain_text = plain_text
+        self.html_text = html_text
+        # Filled in by MessageSkeleton the first time the email is sent
+        self.encoded_bodies = None
+
+
+# Class for a bounded LRU cache of rendered emails. The key is built from exactly the
+# columns the templates and conditions read, so recipients that only differ in other
+# columns (e.g. Mail) share one rendering.
+class RenderCache:
+    def __init__(self, columns, maxsize=10000):
+        # With columns None the rendering cannot be keyed safely and the cache stays off
+        self.columns = tuple(sorted(columns)) if columns is not None else None
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.columns is not None and self.maxsize > 0
+
+    def key(self, recipient_name, recipient_data):
+        """Return the cache key of a recipient, or None if the recipient must be rendered individually"""
+        if not self.enabled:
+            return None
+        values = [bool(recipient_name)]
+        for column in self.columns:
+            if column in recipient_data:
+                value = str(recipient_data[column])
+                # Placeholders inside values are expanded again and may read any column
+                if '{' in value or '}' in value:
+                    return None
+                values.append(value)
+            else:
+                values.append(_MISSING)
+        return tuple(values)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def add_counts(self, hits, misses):
+        """Add the hits and misses of a cache in another process, e.g. a render worker"""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def __len__(self):
+        return len(self._entries)
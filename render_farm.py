@@ -0,0 +1,100 @@
+import os
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from recipient_record import RecipientRecord
+from mime_fastpath import MessageSkeleton
+from instrumentation import logger, METRICS, ERROR
+
+# One message skeleton per sender address and worker process
+_skeletons = {}
+
+
+def _init_worker():
+    # Log lines of the workers are discarded anyway, and they must not write into the parent's JSON sink
+    logger.detach_sink()
+    logger.set_level(ERROR + 1)
+    # Importing newPage compiles the templates and conditions - once per worker process
+    import newPage  # noqa: F401
+
+
+def render_batch(columns, rows, sender_email):
+    """
+    Render a batch of recipients into finished messages. Runs in a worker process.
+    Returns one dict per recipient with 'Name', 'Mail', 'message' (bytes) and 'error',
+    together with the metrics snapshot and the render cache (hits, misses) of the batch for the parent process.
+    """
+    from newPage import render_email, RENDER_CACHE
+
+    METRICS.reset()
+    hits, misses = RENDER_CACHE.hits, RENDER_CACHE.misses
+
+    skeleton = _skeletons.get(sender_email)
+    if skeleton is None:
+        skeleton = _skeletons[sender_email] = MessageSkeleton(sender_email)
+
+    column_index = {column: position for position, column in enumerate(columns)}
+    rendered = []
+    # The status lines of newPage would only interleave with the output of the sending side
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for values in rows:
+            record = RecipientRecord(column_index, values)
+            name = record.get('Name')
+            email = record.get('Mail')
+            try:
+                rendered_email = render_email(name, record)
+                with METRICS.timer("mime_build"):
+                    message = skeleton.render_cached(email, name, rendered_email)
+                rendered.append({'Name': name, 'Mail': email, 'message': message, 'error': None})
+            except Exception as e:
+                rendered.append({'Name': name, 'Mail': email, 'message': None,
+                                 'error': f"Failed to process email for {name}: {e}"})
+    return rendered, METRICS.snapshot(), (RENDER_CACHE.hits - hits, RENDER_CACHE.misses - misses)
+
+
+def _batches(records, batch_size):
+    """Group RecipientRecords into (columns, rows) shards that are cheap to send to a worker"""
+    columns = None
+    rows = []
+    for record in records:
+        if columns is None:
+            columns = tuple(record)
+        rows.append(record.as_tuple())
+        if len(rows) >= batch_size:
+            yield columns, rows
+            rows = []
+    if rows:
+        yield columns, rows
+
+
+def _collect(future):
+    from newPage import RENDER_CACHE
+
+    rendered, metrics, cache_counts = future.result()
+    METRICS.merge(metrics)
+    RENDER_CACHE.add_counts(*cache_counts)
+    return rendered
+
+
+def render_in_processes(records, sender_email, processes=None, batch_size=200, max_pending_batches=None):
+    """
+    Render recipients in a pool of worker processes and yield the finished messages
+    (see render_batch) as soon as their batch is done, in no particular order.
+    The stage timings and render cache counts of the workers are added to those of this process.
+    At most max_pending_batches batches are queued or being rendered at any time,
+    which bounds the memory held by rendered but not yet sent messages.
+    """
+    processes = processes or os.cpu_count() or 1
+    max_pending_batches = max_pending_batches or processes * 2
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as executor:
+        pending = set()
+        for columns, rows in _batches(records, batch_size):
+            if len(pending) >= max_pending_batches:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from _collect(future)
+            pending.add(executor.submit(render_batch, columns, rows, sender_email))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from _collect(future)
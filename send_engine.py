@@ -0,0 +1,117 @@
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+
+def recipient_domain(email):
+    """Return the lower-cased domain part of an email address"""
+    return str(email).rpartition('@')[2].strip().lower()
+
+
+class SendSummary:
+    """Thread-safe tally of successful and failed recipients of one run"""
+
+    def __init__(self):
+        self.successful_sends = 0
+        self.failed_sends = 0
+        self.failed_recipients = []
+        self._lock = threading.Lock()
+
+    def record(self, name, success, error_msg=None):
+        with self._lock:
+            if success:
+                self.successful_sends += 1
+            else:
+                self.failed_sends += 1
+                self.failed_recipients.append((name, error_msg))
+
+    @property
+    def total(self):
+        return self.successful_sends + self.failed_sends
+
+
+class DomainLimiter:
+    """Caps the number of in-flight sends per recipient domain"""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, domain):
+        if not self.limit:
+            yield
+            return
+        with self._lock:
+            semaphore = self._semaphores.get(domain)
+            if semaphore is None:
+                semaphore = self._semaphores[domain] = threading.BoundedSemaphore(self.limit)
+        with semaphore:
+            yield
+
+
+def run_sends(recipients, process_recipient, workers=1, per_domain_limit=None, summary=None, scheduler=None):
+    """
+    Call process_recipient(recipient) for every recipient and collect the results.
+    process_recipient must return (success, error_msg) like process_personalized_email,
+    with success None when the recipient was queued for a retry on the scheduler.
+    With workers > 1 the recipients are processed in a thread pool, with at most
+    `workers` recipients in flight overall and at most `per_domain_limit` per domain.
+    """
+    summary = summary if summary is not None else SendSummary()
+    limiter = DomainLimiter(per_domain_limit)
+    # Number of recipients handed out but not finished yet - a running send may still queue a retry
+    active = [0]
+    finished = threading.Condition()
+
+    def handle(recipient):
+        name = recipient['Name']
+        try:
+            with limiter.slot(recipient_domain(recipient['Mail'])):
+                success, error_msg = process_recipient(recipient)
+        except Exception as e:
+            success, error_msg = False, f"Failed to process email for {name}: {e}"
+        if success is not None:
+            summary.record(name, success, error_msg)
+        with finished:
+            active[0] -= 1
+            finished.notify_all()
+
+    def with_retries(recipients):
+        # Mix due retries into the list as it is processed, then drain what is left at the end
+        for recipient in recipients:
+            if scheduler is not None:
+                yield from scheduler.due_retries()
+            yield recipient
+        if scheduler is None:
+            return
+        while True:
+            with finished:
+                finished.wait_for(lambda: active[0] == 0 or scheduler.pending)
+                if not scheduler.pending:
+                    return
+            yield scheduler.next_retry()
+
+    def dispatch(recipient):
+        with finished:
+            active[0] += 1
+        return recipient
+
+    if workers <= 1:
+        # Serial run - keeps the output in CSV order
+        for recipient in with_retries(recipients):
+            handle(dispatch(recipient))
+        return summary
+
+    # Only keep a few recipients per worker queued so long lists are not all submitted up front
+    in_flight = threading.BoundedSemaphore(workers * 2)
+
+    def release(_future):
+        in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for recipient in with_retries(recipients):
+            in_flight.acquire()
+            executor.submit(handle, dispatch(recipient)).add_done_callback(release)
+    return summary
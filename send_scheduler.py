@@ -0,0 +1,214 @@
+import math
+import time
+import heapq
+import random
+import smtplib
+import threading
+
+# Reply codes a server uses to tell us we are sending too fast
+THROTTLE_CODES = (421, 451)
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+
+def classify_error(error):
+    """Sort an exception from a send attempt into TRANSIENT (worth retrying) or PERMANENT"""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return TRANSIENT if 400 <= error.smtp_code < 500 else PERMANENT
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return TRANSIENT if codes and all(400 <= code < 500 for code in codes) else PERMANENT
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)):
+        return TRANSIENT
+    return PERMANENT
+
+
+def is_throttled(error):
+    """Check whether the server rejected a message because we are sending too fast"""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code in THROTTLE_CODES
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(code in THROTTLE_CODES for code, _ in error.recipients.values())
+    return False
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the number of messages per second.
+    The rate drops when the server throttles us and slowly climbs back to max_rate
+    (the starting rate by default, math.inf for no upper limit).
+    """
+
+    def __init__(self, rate, burst=1, min_rate=0.1, max_rate=None):
+        self.max_rate = float(rate if max_rate is None else max_rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate == math.inf:
+            # Climbed back past any finite rate - inf * 0 seconds would be NaN
+            self.tokens = self.capacity
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available and return 0, otherwise return the seconds until the next one"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a message may be sent"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Like acquire(), for the asyncio send path - waits without blocking the event loop"""
+        # Only the --async path gets here, so the other runs do not pay for importing asyncio
+        import asyncio
+
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def slow_down(self, factor=0.5):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * factor)
+            # Drop the saved-up burst as well, otherwise the next messages still go out at full speed
+            self.tokens = min(self.tokens, 1.0)
+
+    def speed_up(self, factor=1.02):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * factor)
+
+
+def retry_key(recipient):
+    """
+    Key the retries of a recipient are counted under: its address, or the recipient's own
+    retry_key if it has one (the same address in several campaigns of a batch run has separate budgets)
+    """
+    key = getattr(recipient, 'retry_key', None)
+    return key if key is not None else recipient['Mail']
+
+
+# Class for pacing sends and scheduling retries of temporary failures.
+# Retries wait in a delayed queue ordered by due time, so the rest of the list keeps
+# being sent while a deferred recipient waits for its backoff to run out.
+# Without a rate limit nothing is paced until the server throttles us; from then on a
+# token bucket starting at the rate sent so far slows down and speeds up as usual.
+class SendScheduler:
+    def __init__(self, rate_limit=10, burst=10, min_rate=0.1, max_retries=3,
+                 retry_base_delay=30, retry_max_delay=600):
+        self.bucket = TokenBucket(rate_limit, burst, min_rate) if rate_limit else None
+        self.burst = burst
+        self.min_rate = min_rate
+        # Messages sent since the first acquire(), for the starting rate of a bucket created on throttling
+        self._started = None
+        self._sent = 0
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.retries_scheduled = 0
+        self._attempts = {}
+        self._queue = []
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait for the rate limit before sending the next message"""
+        if self.bucket is not None:
+            self.bucket.acquire()
+        elif self._started is None:
+            self._started = time.monotonic()
+
+    async def acquire_async(self):
+        if self.bucket is not None:
+            await self.bucket.acquire_async()
+        elif self._started is None:
+            self._started = time.monotonic()
+
+    def record_success(self, recipient):
+        with self._lock:
+            self._attempts.pop(retry_key(recipient), None)
+            self._sent += 1
+        if self.bucket is not None:
+            self.bucket.speed_up()
+
+    def _throttled(self):
+        """The server says we are too fast: slow down, starting a rate limit if there is none yet"""
+        with self._lock:
+            if self.bucket is None:
+                elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+                # Throttled before anything went out: start at one message a second
+                rate = self._sent / elapsed if self._sent and elapsed > 0 else 1.0
+                # Unlimited sending had no maximum, so the rate may climb back without one
+                self.bucket = TokenBucket(max(self.min_rate, rate), self.burst, self.min_rate, max_rate=math.inf)
+        self.bucket.slow_down()
+
+    def retry_later(self, recipient, error):
+        """
+        Decide what to do after a failed send. Transient failures are queued for another
+        attempt with exponential backoff and jitter and True is returned; permanent failures
+        and recipients out of retries return False.
+        """
+        if is_throttled(error):
+            self._throttled()
+        if classify_error(error) != TRANSIENT:
+            return False
+        key = retry_key(recipient)
+        with self._lock:
+            attempt = self._attempts.get(key, 0) + 1
+            if attempt > self.max_retries:
+                self._attempts.pop(key, None)
+                return False
+            self._attempts[key] = attempt
+            delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1))
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            self._sequence += 1
+            heapq.heappush(self._queue, (time.monotonic() + delay, self._sequence, recipient))
+            self.retries_scheduled += 1
+        return True
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    def due_retries(self):
+        """Pop all recipients whose retry delay has run out"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                due.append(heapq.heappop(self._queue)[2])
+        return due
+
+    def next_retry_delay(self):
+        """Seconds until the earliest queued retry is due, or None if nothing is queued"""
+        with self._lock:
+            if not self._queue:
+                return None
+            return max(0.0, self._queue[0][0] - time.monotonic())
+
+    def next_retry(self):
+        """Wait for the earliest queued retry and return its recipient, or None if nothing is queued"""
+        with self._lock:
+            if not self._queue:
+                return None
+            due_time, _, recipient = heapq.heappop(self._queue)
+        time.sleep(max(0.0, due_time - time.monotonic()))
+        return recipient
@@ -0,0 +1,142 @@
+import smtplib
+import ssl
+import queue
+import threading
+
+from instrumentation import METRICS
+from smtp_pipelining import supports_pipelining, pipelined_sendmail
+
+
+class PooledConnection:
+    """
+    A single authenticated SMTP session together with the number of messages sent on it.
+    Messages are sent pipelined when the server supports it, otherwise with plain sendmail().
+    """
+    __slots__ = ("server", "messages_sent", "pipelining")
+
+    def __init__(self, server, pipelining=False):
+        self.server = server
+        self.messages_sent = 0
+        self.pipelining = pipelining
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        with METRICS.timer("smtp_send"):
+            if self.pipelining:
+                result = pipelined_sendmail(self.server, from_addr, to_addrs, msg)
+            else:
+                result = self.server.sendmail(from_addr, to_addrs, msg)
+        self.messages_sent += 1
+        return result
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            # The session is being thrown away anyway - a failing QUIT does not matter
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+# Class for keeping a small number of logged-in SMTP sessions alive during a send run
+# instead of doing a full TCP + TLS handshake and AUTH for every single recipient
+class SMTPConnectionPool:
+    def __init__(self, sender_server, port, sender_email, password=None,
+                 pool_size=1, max_messages_per_connection=100, use_ssl=True, timeout=60, pipelining=True):
+        self.sender_server = sender_server
+        self.port = int(port)
+        self.sender_email = sender_email
+        self.password = password
+        self.pool_size = max(1, int(pool_size))
+        self.max_messages_per_connection = max(1, int(max_messages_per_connection))
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        # Use ESMTP PIPELINING on servers that advertise it
+        self.pipelining = pipelining
+
+        # Building the SSL context loads the system CA store, so do it once for the whole run
+        self.context = ssl.create_default_context() if use_ssl else None
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.reconnects = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _connect(self):
+        """Open and authenticate a new SMTP session"""
+        with METRICS.timer("smtp_connect"):
+            if self.use_ssl:
+                server = smtplib.SMTP_SSL(self.sender_server, self.port, context=self.context, timeout=self.timeout)
+            else:
+                server = smtplib.SMTP(self.sender_server, self.port, timeout=self.timeout)
+            try:
+                # Local test servers usually run without AUTH, so only log in when a password is given
+                if self.password:
+                    server.login(self.sender_email, self.password)
+                pipelining = self.pipelining and supports_pipelining(server)
+            except Exception:
+                server.close()
+                raise
+        with self._lock:
+            self.connections_opened += 1
+        return PooledConnection(server, pipelining)
+
+    def _checkout(self):
+        """Take an idle session from the pool or open a new one"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _checkin(self, connection):
+        """Return a session to the pool unless it has reached its message cap"""
+        if connection.messages_sent >= self.max_messages_per_connection:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        """
+        Send one message on a pooled session.
+        If the server dropped the session while it was idle, reconnect once and retry.
+        """
+        with self._slots:
+            connection = self._checkout()
+            healthy = True
+            try:
+                try:
+                    return connection.sendmail(from_addr, to_addrs, msg)
+                except smtplib.SMTPServerDisconnected:
+                    connection.close()
+                    with self._lock:
+                        self.reconnects += 1
+                    connection = self._connect()
+                    return connection.sendmail(from_addr, to_addrs, msg)
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # The server rejected this message but the session itself is still usable
+                raise
+            except Exception:
+                healthy = False
+                raise
+            finally:
+                if healthy:
+                    self._checkin(connection)
+                else:
+                    connection.close()
+
+    def close(self):
+        """Log out of all idle sessions"""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
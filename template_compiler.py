@@ -0,0 +1,170 @@
+import re
+from functools import lru_cache
+
+# CSV cell values that count as "no data" and therefore trigger the fallback text
+EMPTY_VALUES = ('nan', 'none', 'false', '')
+
+# Nested fallbacks are resolved one level per pass, so deeper nesting than this is never fully resolved
+MAX_ITERATIONS = 5
+
+_SIMPLE_PLACEHOLDER = re.compile(r'\{([^|{}]+)\}')
+_FALLBACK_PLACEHOLDER = re.compile(r'\{([^{}]+\|[^{}]+)\}')
+
+# Render plan operations - a plan is a tuple of literal strings and these tuples:
+#   (_SIMPLE, column)                            for {Column}
+#   (_FALLBACK, raw_column, column, sub_plan)    for {Column|fallback}
+_SIMPLE = 0
+_FALLBACK = 1
+
+
+class _NotCompilable(Exception):
+    """The template uses brace constructs that only the iterative formatter handles exactly"""
+
+
+class _NeedsIterativeFormat(Exception):
+    """A recipient value contains braces, which the iterative formatter would expand again"""
+
+
+def lookup_value(recipient_data, column_name):
+    """Return the stripped value of a column, or '' when it is missing or counts as empty"""
+    if column_name in recipient_data:
+        value = str(recipient_data[column_name]).strip()
+        if value and value.lower() not in EMPTY_VALUES:
+            return value
+    return ""
+
+
+def format_template_iterative(template, recipient_data):
+    """
+    Reference implementation of the placeholder syntax: repeatedly replace {ColumnName}
+    and {ColumnName|fallback} until nothing changes. Used for templates and values the
+    compiled render plan cannot reproduce exactly.
+    """
+    def replace_simple_placeholder(match):
+        return lookup_value(recipient_data, match.group(1).strip())
+
+    def replace_fallback_placeholder(match):
+        column_name, fallback = match.group(1).split('|', 1)
+        return lookup_value(recipient_data, column_name.strip()) or fallback.strip()
+
+    result = template
+    for iteration in range(MAX_ITERATIONS):
+        prev_result = result
+        result = _SIMPLE_PLACEHOLDER.sub(replace_simple_placeholder, result)
+        result = _FALLBACK_PLACEHOLDER.sub(replace_fallback_placeholder, result)
+        # If no changes were made, we're done
+        if result == prev_result:
+            break
+    return result
+
+
+def _parse_sequence(template, pos, depth):
+    """Parse literal text and placeholders until the end of the template or the closing brace of a fallback"""
+    plan = []
+    literal_start = pos
+    length = len(template)
+    while pos < length:
+        char = template[pos]
+        if char == '{':
+            if pos > literal_start:
+                plan.append(template[literal_start:pos])
+            operation, pos = _parse_placeholder(template, pos + 1, depth)
+            plan.append(operation)
+            literal_start = pos
+        elif char == '}':
+            if depth == 0:
+                raise _NotCompilable()
+            break
+        else:
+            pos += 1
+    else:
+        if depth > 0:
+            raise _NotCompilable()
+    if pos > literal_start:
+        plan.append(template[literal_start:pos])
+    return tuple(plan), pos
+
+
+def _parse_placeholder(template, pos, depth):
+    """Parse a placeholder whose opening brace has just been consumed"""
+    end = pos
+    length = len(template)
+    while end < length and template[end] not in '{}|':
+        end += 1
+    if end == length or template[end] == '{' or end == pos:
+        raise _NotCompilable()
+    raw_column = template[pos:end]
+    if template[end] == '}':
+        return (_SIMPLE, raw_column.strip()), end + 1
+    if depth + 1 > MAX_ITERATIONS:
+        raise _NotCompilable()
+    sub_plan, end = _parse_sequence(template, end + 1, depth + 1)
+    return (_FALLBACK, raw_column, raw_column.strip(), sub_plan), end + 1
+
+
+def _checked_value(recipient_data, column_name):
+    value = lookup_value(recipient_data, column_name)
+    if '{' in value or '}' in value:
+        raise _NeedsIterativeFormat()
+    return value
+
+
+def _render_plan(plan, recipient_data):
+    parts = []
+    for operation in plan:
+        if operation.__class__ is str:
+            parts.append(operation)
+        elif operation[0] == _SIMPLE:
+            parts.append(_checked_value(recipient_data, operation[1]))
+        else:
+            fallback = _render_plan(operation[3], recipient_data)
+            if not fallback or '{' in fallback or '}' in fallback:
+                # An empty or unresolved fallback never matches the placeholder syntax and stays as written
+                parts.append('{' + operation[1] + '|' + fallback + '}')
+            else:
+                parts.append(_checked_value(recipient_data, operation[2]) or fallback.strip())
+    return ''.join(parts)
+
+
+def _plan_columns(plan, columns):
+    for operation in plan:
+        if operation.__class__ is str:
+            continue
+        if operation[0] == _SIMPLE:
+            columns.add(operation[1])
+        else:
+            columns.add(operation[2])
+            _plan_columns(operation[3], columns)
+    return columns
+
+
+class CompiledTemplate:
+    """A template parsed once into a render plan that fills in a recipient in a single pass"""
+    __slots__ = ('template', 'plan', 'columns')
+
+    def __init__(self, template):
+        self.template = template
+        try:
+            self.plan, _ = _parse_sequence(template, 0, 0)
+        except _NotCompilable:
+            self.plan = None
+        # Columns the template reads - None if they cannot be determined without rendering
+        self.columns = frozenset(_plan_columns(self.plan, set())) if self.plan is not None else None
+
+    def render(self, recipient_data):
+        """Fill in the template with recipient data, identical to format_template_iterative"""
+        plan = self.plan
+        if plan is not None:
+            if len(plan) == 1 and plan[0].__class__ is str:
+                return plan[0]
+            try:
+                return _render_plan(plan, recipient_data)
+            except _NeedsIterativeFormat:
+                pass
+        return format_template_iterative(self.template, recipient_data)
+
+
+@lru_cache(maxsize=None)
+def compile_template(template):
+    """Return the cached CompiledTemplate for a template string"""
+    return CompiledTemplate(template)